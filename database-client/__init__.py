@@ -1,6 +1,7 @@
 # Database Client Package
 __version__ = "1.0.0"
 
-from .client import DatabaseClient
+from .client import DatabaseClient, DatabaseClientError
+from .cache import CachedDatabaseClient
 
-__all__ = ["DatabaseClient"] 
\ No newline at end of file
+__all__ = ["DatabaseClient", "DatabaseClientError", "CachedDatabaseClient"] 
\ No newline at end of file
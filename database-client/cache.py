@@ -0,0 +1,129 @@
+from cachetools import TTLCache
+from typing import Optional, Dict, Any, List, Hashable, Awaitable, Callable
+
+from .client import DatabaseClient
+
+class CachedDatabaseClient(DatabaseClient):
+    """DatabaseClient with a short-lived cache-aside layer for single-user lookups."""
+    
+    def __init__(self, base_url: str, api_secret_key: str, cache_ttl: float = 5.0,
+                 cache_max_entries: int = 1024, **kwargs):
+        """
+        Initialize cached database client.
+    
+        Args:
+            base_url: Base URL of the database service (e.g., http://localhost:8001)
+            api_secret_key: Secret key for API authentication
+            cache_ttl: Seconds a cached lookup stays valid
+            cache_max_entries: Maximum number of cached lookups
+            **kwargs: Passed through to DatabaseClient
+        """
+        super().__init__(base_url, api_secret_key, **kwargs)
+        self._cache: TTLCache = TTLCache(maxsize=cache_max_entries, ttl=cache_ttl)
+    
+    async def _cached(self, key: Hashable, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return the cached response for key, fetching and caching it on a miss."""
+        response = self._cache.get(key)
+        if response is None:
+            response = await fetch()
+            if response.get('success'):
+                self._cache[key] = response
+        return response
+    
+    async def _invalidating(self, user_ids: List[str], write: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Await a write, then drop cached lookups of the users it touched (even if it failed)."""
+        try:
+            return await write
+        finally:
+            for user_id in user_ids:
+                self.invalidate_user(user_id)
+    
+    def invalidate_user(self, user_id: str):
+        """Drop every cached lookup that returned the given user."""
+        stale_keys = [
+            key for key, response in self._cache.items()
+            if (response.get('data') or {}).get('id') == user_id
+        ]
+        for key in stale_keys:
+            self._cache.pop(key, None)
+    
+    def clear_cache(self):
+        """Drop all cached lookups."""
+        self._cache.clear()
+    
+    # Cached lookups
+    
+    async def get_user_by_id(self, user_id: str, public_only: bool = False) -> Dict[str, Any]:
+        """Get user by MongoDB ObjectId (cached)."""
+        return await self._cached(
+            ('id', user_id, public_only),
+            lambda: super(CachedDatabaseClient, self).get_user_by_id(user_id, public_only)
+        )
+    
+    async def get_user_by_email(self, email: str) -> Dict[str, Any]:
+        """Get user by email address (cached)."""
+        return await self._cached(
+            ('email', email),
+            lambda: super(CachedDatabaseClient, self).get_user_by_email(email)
+        )
+    
+    async def get_user_by_discord_id(self, user_id: int, guild_id: int) -> Dict[str, Any]:
+        """Get user by Discord user_id and guild_id (cached)."""
+        return await self._cached(
+            ('discord', user_id, guild_id),
+            lambda: super(CachedDatabaseClient, self).get_user_by_discord_id(user_id, guild_id)
+        )
+    
+    # Writes invalidate the affected users
+    
+    async def update_user(self, user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update user information."""
+        return await self._invalidating([user_id], super().update_user(user_id, user_data))
+    
+    async def delete_user(self, user_id: str) -> Dict[str, Any]:
+        """Delete user by id."""
+        return await self._invalidating([user_id], super().delete_user(user_id))
+    
+    async def deactivate_user(self, user_id: str) -> Dict[str, Any]:
+        """Deactivate user account (soft delete)."""
+        return await self._invalidating([user_id], super().deactivate_user(user_id))
+    
+    async def activate_user(self, user_id: str) -> Dict[str, Any]:
+        """Activate deactivated user account."""
+        return await self._invalidating([user_id], super().activate_user(user_id))
+    
+    async def update_user_login(self, user_id: str) -> Dict[str, Any]:
+        """Update user's last login timestamp."""
+        return await self._invalidating([user_id], super().update_user_login(user_id))
+    
+    async def user_actions(self, user_id: str, ops: List[str]) -> Dict[str, Any]:
+        """Apply several account actions in order, in one request."""
+        return await self._invalidating([user_id], super().user_actions(user_id, ops))
+    
+    async def add_user_tag(self, user_id: str, tag: str) -> Dict[str, Any]:
+        """Add a tag to user."""
+        return await self._invalidating([user_id], super().add_user_tag(user_id, tag))
+    
+    async def remove_user_tag(self, user_id: str, tag: str) -> Dict[str, Any]:
+        """Remove a tag from user."""
+        return await self._invalidating([user_id], super().remove_user_tag(user_id, tag))
+    
+    async def update_user_tags(self, user_id: str, add: Optional[List[str]] = None,
+                               remove: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Add and remove several tags in one request (removals are applied first)."""
+        return await self._invalidating([user_id], super().update_user_tags(user_id, add, remove))
+    
+    async def bulk_update_users(self, user_ids: List[str], update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update multiple users at once."""
+        return await self._invalidating(user_ids, super().bulk_update_users(user_ids, update_data))
+    
+    async def bulk_update_users_individually(self, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Update multiple users at once, each with its own data (user ID -> update data)."""
+        return await self._invalidating(list(updates), super().bulk_update_users_individually(updates))
+    
+    async def bulk_update_by_filter(self, query_filter: Dict[str, Any], update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update the users matched by a query; the affected users are unknown, so clear the cache."""
+        try:
+            return await super().bulk_update_by_filter(query_filter, update_data)
+        finally:
+            self.clear_cache()
@@ -1,28 +1,81 @@
 import httpx
 import hmac
+import orjson
 import hashlib
+import re
 import time
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, Callable, List, Mapping, Tuple, Union
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Cheap local checks for inputs the service would reject anyway
+_OBJECT_ID_PATTERN = re.compile(r'^[0-9a-fA-F]{24}$')
+_REQUIRED_USER_FIELDS = ('user_id', 'guild_id', 'real_name', 'email')
+
+def _json_default(obj: Any) -> Any:
+    """orjson fallback: serialize read-only mappings (e.g. MappingProxyType) as objects."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# Keep-alive connection pool shared by all requests made through one client
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+# Request extension key holding the perf_counter() value at send time
+_TIMING_EXTENSION = "hackit.started"
+
+# Seconds a healthy health_check response is reused for the same base URL
+HEALTH_CHECK_TTL = 10.0
+
 class DatabaseClient:
     """Enhanced client for HackIt Database Service with full API support."""
     
-    def __init__(self, base_url: str, api_secret_key: str, timeout: float = 30.0):
+    # Process-wide: base_url -> (expires_at, healthy response)
+    _health_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+    
+    def __init__(self, base_url: str, api_secret_key: str, timeout: Union[float, httpx.Timeout] = 30.0,
+                 limits: Optional[httpx.Limits] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 on_request_timing: Optional[Callable[[str, str, float], None]] = None):
         """
         Initialize database client.
         
         Args:
             base_url: Base URL of the database service (e.g., http://localhost:8001)
             api_secret_key: Secret key for API authentication
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds, or an httpx.Timeout
+            limits: Connection pool limits (defaults to DEFAULT_LIMITS)
+            transport: Pre-built transport, e.g. to share one connection pool between clients.
+                The caller owns it: close() leaves an injected transport open.
+            on_request_timing: Called with (method, path, milliseconds) after every response
         """
         self.base_url = base_url.rstrip('/')
         self.api_secret_key = api_secret_key
-        self.client = httpx.AsyncClient(timeout=timeout)
+        self._on_request_timing = on_request_timing
+        self._owns_transport = transport is None
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=limits or DEFAULT_LIMITS,
+            transport=transport,
+            event_hooks={'request': [self._start_timing], 'response': [self._finish_timing]}
+        )
+    
+    async def _start_timing(self, request: httpx.Request):
+        """httpx request hook: stamp the request with its send time."""
+        request.extensions[_TIMING_EXTENSION] = time.perf_counter()
+    
+    async def _finish_timing(self, response: httpx.Response):
+        """httpx response hook: log and report the time until response headers arrived."""
+        started = response.request.extensions.get(_TIMING_EXTENSION)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        request = response.request
+        logger.debug("%s %s -> %s in %.1fms", request.method, request.url.path, response.status_code, elapsed_ms)
+        if self._on_request_timing:
+            self._on_request_timing(request.method, request.url.path, elapsed_ms)
         
     def _create_api_signature(self, data: str, timestamp: int) -> str:
         """Create HMAC signature for API request validation."""
@@ -56,14 +109,18 @@ class DatabaseClient:
             headers.update(kwargs['headers'])
         kwargs['headers'] = headers
         
+        # Encode JSON bodies with orjson (Content-Type is already set above)
+        if 'json' in kwargs:
+            kwargs['content'] = orjson.dumps(kwargs.pop('json'), default=_json_default)
+        
         try:
             response = await self.client.request(method, url, **kwargs)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP {e.response.status_code} error in {method} {path}: {e.response.text}")
             try:
-                error_data = e.response.json()
+                error_data = orjson.loads(e.response.content)
                 raise DatabaseClientError(
                     message=error_data.get('detail', str(e)),
                     status_code=e.response.status_code,
@@ -81,14 +138,38 @@ class DatabaseClient:
             logger.error(f"Unexpected error in {method} {path}: {str(e)}")
             raise DatabaseClientError(f"Unexpected error: {str(e)}")
 
+    @staticmethod
+    def _validate_object_id(user_id: str):
+        """Reject malformed MongoDB ObjectIds without a round trip."""
+        if not isinstance(user_id, str) or not _OBJECT_ID_PATTERN.match(user_id):
+            raise DatabaseClientError(
+                message=f"Invalid user ObjectId: {user_id}",
+                status_code=400,
+                error_code="VALIDATION_ERROR"
+            )
+    
+    @staticmethod
+    def _validate_user_data(user_data: Dict[str, Any]):
+        """Reject user payloads missing a required field without a round trip; the server validates the values."""
+        missing = [field for field in _REQUIRED_USER_FIELDS if user_data.get(field) is None]
+        if missing:
+            raise DatabaseClientError(
+                message=f"Missing required fields: {', '.join(missing)}",
+                status_code=400,
+                error_code="VALIDATION_ERROR"
+            )
+    
     # User CRUD Operations
     
-    async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new user."""
-        return await self._make_request("POST", "/users/", json=user_data)
+    async def create_user(self, user_data: Dict[str, Any], upsert: bool = False) -> Dict[str, Any]:
+        """Create a new user; with upsert, return the existing user instead of failing on a taken Discord ID."""
+        self._validate_user_data(user_data)
+        params = {"upsert": "true"} if upsert else None
+        return await self._make_request("POST", "/users/", json=user_data, params=params)
     
     async def get_user_by_id(self, user_id: str, public_only: bool = False) -> Dict[str, Any]:
         """Get user by MongoDB ObjectId."""
+        self._validate_object_id(user_id)
         endpoint = f"/users/{user_id}/public" if public_only else f"/users/{user_id}"
         return await self._make_request("GET", endpoint)
     
@@ -100,53 +181,89 @@ class DatabaseClient:
         """Get user by Discord user_id and guild_id."""
         return await self._make_request("GET", f"/users/discord/{user_id}/{guild_id}")
     
+    async def get_users_by_ids(self, user_ids: List[str], public_only: bool = False) -> Dict[str, Any]:
+        """Get multiple users by MongoDB ObjectId in a single request."""
+        return await self._make_request(
+            "POST", "/users/batch", json={"user_ids": user_ids, "public_only": public_only}
+        )
+    
     async def update_user(self, user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update user information."""
+        self._validate_object_id(user_id)
         return await self._make_request("PUT", f"/users/{user_id}", json=user_data)
     
     async def delete_user(self, user_id: str) -> Dict[str, Any]:
         """Delete user by id."""
+        self._validate_object_id(user_id)
         return await self._make_request("DELETE", f"/users/{user_id}")
     
     # User Status Management
     
     async def deactivate_user(self, user_id: str) -> Dict[str, Any]:
         """Deactivate user account (soft delete)."""
+        self._validate_object_id(user_id)
         return await self._make_request("PATCH", f"/users/{user_id}/deactivate")
     
     async def activate_user(self, user_id: str) -> Dict[str, Any]:
         """Activate deactivated user account."""
+        self._validate_object_id(user_id)
         return await self._make_request("PATCH", f"/users/{user_id}/activate")
     
     async def update_user_login(self, user_id: str) -> Dict[str, Any]:
         """Update user's last login timestamp."""
+        self._validate_object_id(user_id)
         return await self._make_request("PATCH", f"/users/{user_id}/login")
     
+    async def user_actions(self, user_id: str, ops: List[str]) -> Dict[str, Any]:
+        """Apply several account actions ("login", "deactivate", "activate") in order, in one request."""
+        self._validate_object_id(user_id)
+        return await self._make_request("POST", f"/users/{user_id}/actions",
+                                        json={"actions": [{"op": op} for op in ops]})
+    
     # Tag Management
     
     async def add_user_tag(self, user_id: str, tag: str) -> Dict[str, Any]:
         """Add a tag to user."""
+        self._validate_object_id(user_id)
         return await self._make_request("POST", f"/users/{user_id}/tags", json={"tag": tag})
     
     async def remove_user_tag(self, user_id: str, tag: str) -> Dict[str, Any]:
         """Remove a tag from user."""
+        self._validate_object_id(user_id)
         return await self._make_request("DELETE", f"/users/{user_id}/tags", json={"tag": tag})
     
+    async def update_user_tags(self, user_id: str, add: Optional[List[str]] = None,
+                               remove: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Add and remove several tags in one request (removals are applied first)."""
+        self._validate_object_id(user_id)
+        return await self._make_request(
+            "PATCH", f"/users/{user_id}/tags", json={"add": add or [], "remove": remove or []}
+        )
+    
+    async def add_user_tags(self, user_id: str, tags: List[str]) -> Dict[str, Any]:
+        """Add several tags to user in one request."""
+        return await self.update_user_tags(user_id, add=tags)
+    
     # Query and Search Operations
     
-    async def query_users(self, query_params: Dict[str, Any]) -> Dict[str, Any]:
-        """Query users with advanced filters."""
+    async def query_users(self, query_params: Dict[str, Any], cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Query users with advanced filters. Pass the previous page's pagination.next_cursor as cursor."""
+        if cursor:
+            query_params = {**query_params, "cursor": cursor}
         return await self._make_request("POST", "/users/query", json=query_params)
     
     async def list_users(self, limit: int = 10, offset: int = 0, 
-                        active_only: bool = False, public_only: bool = False) -> Dict[str, Any]:
-        """List users with pagination."""
+                        active_only: bool = False, public_only: bool = False,
+                        cursor: Optional[str] = None) -> Dict[str, Any]:
+        """List users with pagination. Pass the previous page's pagination.next_cursor as cursor."""
         params = {
             "limit": limit, 
             "offset": offset,
             "active_only": active_only,
             "public_only": public_only
         }
+        if cursor:
+            params["cursor"] = cursor
         return await self._make_request("GET", "/users/", params=params)
     
     async def search_users_by_name(self, name: str, limit: int = 20) -> Dict[str, Any]:
@@ -154,9 +271,11 @@ class DatabaseClient:
         params = {"limit": limit}
         return await self._make_request("GET", f"/users/search/name/{name}", params=params)
     
-    async def get_users_by_tag(self, tag: str, limit: int = 50) -> Dict[str, Any]:
-        """Get users that have a specific tag."""
+    async def get_users_by_tag(self, tag: str, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get active users that have a specific tag, newest first (pass next_cursor to page)."""
         params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
         return await self._make_request("GET", f"/users/tag/{tag}", params=params)
     
     # Analytics and Statistics
@@ -175,11 +294,40 @@ class DatabaseClient:
         }
         return await self._make_request("PUT", "/users/bulk", json=bulk_data)
     
+    async def bulk_update_users_individually(self, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Update multiple users at once, each with its own data (user ID -> update data)."""
+        bulk_data = {
+            "updates": [
+                {"user_id": user_id, "update_data": update_data}
+                for user_id, update_data in updates.items()
+            ]
+        }
+        return await self._make_request("PUT", "/users/bulk/individual", json=bulk_data)
+    
+    async def bulk_update_by_filter(self, query_filter: Dict[str, Any], update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update the users matched by a query (same fields as query_users) in one request."""
+        bulk_data = {
+            "filter": query_filter,
+            "update": update_data
+        }
+        return await self._make_request("POST", "/users/bulk_update_by_filter", json=bulk_data)
+    
     # System Operations
     
-    async def health_check(self) -> Dict[str, Any]:
-        """Check database service health."""
-        return await self._make_request("GET", "/health")
+    async def health_check(self, use_cache: bool = True) -> Dict[str, Any]:
+        """Check database service health; healthy responses are reused for HEALTH_CHECK_TTL seconds."""
+        now = time.monotonic()
+        if use_cache:
+            cached = self._health_cache.get(self.base_url)
+            if cached and cached[0] > now:
+                return cached[1]
+        
+        response = await self._make_request("GET", "/health")
+        if response.get("status") == "healthy":
+            self._health_cache[self.base_url] = (now + HEALTH_CHECK_TTL, response)
+        else:
+            self._health_cache.pop(self.base_url, None)
+        return response
     
     async def get_service_info(self) -> Dict[str, Any]:
         """Get service information and available endpoints."""
@@ -214,7 +362,8 @@ class DatabaseClient:
             return response.get('data') if response.get('success') else None
             
         except DatabaseClientError as e:
-            if e.status_code == 404:
+            # 400 is a malformed identifier rejected locally; it cannot match a user either
+            if e.status_code in (400, 404):
                 return None
             raise
     
@@ -247,8 +396,10 @@ class DatabaseClient:
             return await self.create_user(user_data)
     
     async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
+        """Close the HTTP client. An injected transport is left for its owner to close."""
+        # AsyncClient.aclose() also closes its transport, so only call it when we built the pool
+        if self._owns_transport:
+            await self.client.aclose()
     
     async def __aenter__(self):
         """Async context manager entry."""
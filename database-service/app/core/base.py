@@ -12,7 +12,9 @@ class BaseModel(Document):
     
     meta = {
         'abstract': True,
-        'indexes': []
+        'indexes': [],
+        # Indexes are created once at startup instead of before writes
+        'auto_create_index': False
     }
     
     def to_dict(self) -> Dict[str, Any]:
@@ -32,6 +34,26 @@ class BaseModel(Document):
         result['id'] = str(self.id)
         return result
     
+    @classmethod
+    def son_to_dict(cls, son: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a raw MongoDB document (e.g. from as_pymongo()) to a dictionary for API response."""
+        result = {}
+        for field_name, field in cls._fields.items():
+            field_value = son.get(field.db_field)
+            if field_value is None and field.default is not None:
+                field_value = field.default() if callable(field.default) else field.default
+            if field_value is not None:
+                if isinstance(field_value, ObjectId):
+                    result[field_name] = str(field_value)
+                elif isinstance(field_value, datetime):
+                    result[field_name] = field_value.isoformat()
+                else:
+                    result[field_name] = field_value
+        
+        # Add the MongoDB ObjectId as 'id'
+        result['id'] = str(son['_id'])
+        return result
+    
     def update_from_dict(self, data: Dict[str, Any], exclude_fields: Optional[List[str]] = None) -> None:
         """Update model fields from dictionary data."""
         exclude_fields = exclude_fields or ['id', '_id']
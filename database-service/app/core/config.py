@@ -2,6 +2,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator, Field
 from typing import List, Optional, Annotated
 import secrets
+from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,9 @@ class DatabaseSettings(BaseSettings):
     MONGODB_MAX_POOL_SIZE: int = Field(default=10, description="MongoDB connection pool size")
     MONGODB_MIN_POOL_SIZE: int = Field(default=1, description="MongoDB minimum pool size")
     MONGODB_CONNECT_TIMEOUT: int = Field(default=10000, description="MongoDB connection timeout (ms)")
+    MONGODB_MAX_IDLE_TIME_MS: int = Field(default=60000, description="Close pooled MongoDB connections idle for longer than this (ms)")
+    MONGODB_SERVER_SELECTION_TIMEOUT: int = Field(default=3000, description="MongoDB server selection timeout (ms)")
+    MONGODB_COMPRESSORS: str = Field(default="zlib", description="Comma-separated wire compressors (zstd, snappy, zlib)")
     
     # API Security
     API_SECRET_KEY: str = Field(..., description="HMAC secret key for API authentication")
@@ -61,11 +65,18 @@ class DatabaseSettings(BaseSettings):
     # Performance settings
     CACHE_ENABLED: bool = Field(default=False, description="Enable caching")
     CACHE_TTL_SECONDS: int = Field(default=300, description="Cache TTL in seconds")
+    CACHE_MAX_ENTRIES: int = Field(default=10000, description="Maximum entries in the in-process user lookup cache")
     MAX_CONNECTIONS: int = Field(default=100, description="Maximum concurrent connections")
+    HEALTH_CACHE_TTL_SECONDS: float = Field(default=2.0, description="Seconds to reuse the last /health result")
     
     # Avatar settings
     AVATAR_CACHE_ENABLED: bool = Field(default=True, description="Enable avatar caching")
     AVATAR_CACHE_TTL_SECONDS: int = Field(default=3600, description="Avatar cache TTL in seconds (1 hour)")
+    AVATAR_CACHE_DIR: str = Field(
+        default=str(Path(__file__).resolve().parents[2] / "cache" / "avatars"),
+        description="Directory for decoded avatar files shared across workers (defaults to database-service/cache/avatars)"
+    )
+    AVATAR_CACHE_MAX_FILES: int = Field(default=1000, description="Maximum decoded avatar files kept on disk (oldest are evicted)")
     AVATAR_MAX_FILE_SIZE_MB: int = Field(default=5, description="Maximum avatar file size in MB")
     AVATAR_CACHE_CONTROL_MAX_AGE: int = Field(default=86400, description="HTTP Cache-Control max-age for avatars (1 day)")
     AVATAR_ENABLE_ETAG: bool = Field(default=True, description="Enable ETag headers for avatars")
@@ -1,22 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
 from mongoengine import connect, disconnect
+from mongoengine.connection import get_connection
 from .config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 def connect_to_mongo():
-    """Connect to MongoDB database."""
+    """Connect to MongoDB database with a tuned connection pool."""
     try:
-        connect(db=settings.MONGODB_DATABASE, host=settings.MONGODB_URI)
+        connect(
+            db=settings.MONGODB_DATABASE,
+            host=settings.MONGODB_URI,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+            connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT,
+            compressors=settings.MONGODB_COMPRESSORS or None
+        )
         logger.info(f"Connected to MongoDB database: {settings.MONGODB_DATABASE}")
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {str(e)}")
         raise
 
+def warm_up_pool():
+    """Open MONGODB_MIN_POOL_SIZE sockets up front with concurrent pings."""
+    client = get_connection()
+    workers = max(settings.MONGODB_MIN_POOL_SIZE, 1)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: client.admin.command('ping'), range(workers)))
+        logger.info(f"Warmed up MongoDB connection pool with {workers} connection(s)")
+    except Exception as e:
+        logger.warning(f"Failed to warm up MongoDB connection pool: {str(e)}")
+
 def disconnect_from_mongo():
     """Disconnect from MongoDB database."""
     try:
         disconnect()
         logger.info("Disconnected from MongoDB")
     except Exception as e:
-        logger.error(f"Error disconnecting from MongoDB: {str(e)}") 
\ No newline at end of file
+        logger.error(f"Error disconnecting from MongoDB: {str(e)}") 
@@ -1,6 +1,6 @@
 from mongoengine import IntField, StringField, DateTimeField, EmailField, BooleanField, ListField
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterable, Optional, List
 
 from app.core.base import BaseModel
 
@@ -35,13 +35,28 @@ class RegisteredUser(BaseModel):
     last_updated = DateTimeField(default=datetime.utcnow, help_text="Last update timestamp")
     last_login = DateTimeField(help_text="Last login timestamp")
 
+    # Minimum search term length for the real_name text index
+    TEXT_SEARCH_MIN_LENGTH = 3
+    
+    # Collation of the case-insensitive real_name index
+    NAME_COLLATION = {'locale': 'en', 'strength': 2}
+
     meta = {
         'collection': 'registered_users',
         'indexes': [
-            ('user_id', 'guild_id'),  # Compound index for Discord lookups
-            'is_active',              # Index for filtering active users
-            'registered_at',          # Index for date-based queries
-            'tags',                   # Index for tag-based searches
+            ('-registered_at', '-id'),  # Date queries and keyset (registered_at, _id) pagination
+            ('tags', '-registered_at', '-id'),  # Tag lookups, newest first (keyset pagination)
+            ('is_active', '-registered_at', '-id'),  # Active users, newest first (keyset pagination)
+            {
+                'fields': ['$real_name'],
+                'default_language': 'none',
+                'name': 'real_name_text_idx'
+            },  # Text index for name search
+            {
+                'fields': ['real_name'],
+                'collation': NAME_COLLATION,
+                'name': 'real_name_ci_idx'
+            },  # Case-insensitive index for name prefix search
             {
                 'fields': ['email'],
                 'unique': True,
@@ -52,7 +67,7 @@ class RegisteredUser(BaseModel):
                 'fields': ['user_id', 'guild_id'],
                 'unique': True,
                 'name': 'discord_unique_idx'  # Explicit name to avoid conflicts
-            }  # Unique Discord user per guild
+            }  # Unique Discord user per guild (also serves Discord lookups)
         ],
         'ordering': ['-registered_at']  # Default ordering by registration date
     }
@@ -107,20 +122,53 @@ class RegisteredUser(BaseModel):
             'display_name': self.get_display_name()
         }
     
+    @classmethod
+    def son_to_dict(cls, son: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a raw MongoDB document to the same dictionary as to_dict()."""
+        result = super().son_to_dict(son)
+        result['display_name'] = cls._display_name(result.get('real_name'), result.get('user_id'))
+        result['profile_completeness'] = cls._profile_completeness(result)
+        return result
+    
+    @classmethod
+    def son_to_public_dict(cls, son: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a raw MongoDB document to the same dictionary as to_public_dict()."""
+        registered_at = son.get('registered_at')
+        return {
+            'id': str(son['_id']),
+            'real_name': son.get('real_name'),
+            'bio': son.get('bio'),
+            'location': son.get('location'),
+            'website': son.get('website'),
+            'github_username': son.get('github_username'),
+            'linkedin_url': son.get('linkedin_url'),
+            'tags': son.get('tags') or [],
+            'registered_at': registered_at.isoformat() if registered_at else None,
+            'display_name': cls._display_name(son.get('real_name'), son.get('user_id'))
+        }
+    
+    @staticmethod
+    def _display_name(real_name: Optional[str], user_id: Optional[int]) -> str:
+        """Build a display name from the real name, falling back to the Discord user ID."""
+        return real_name or f"User_{user_id}"
+    
+    @staticmethod
+    def _profile_completeness(data: Dict[str, Any]) -> float:
+        """Calculate profile completeness percentage from field values."""
+        total_fields = ['real_name', 'email', 'bio', 'location', 'avatar_base64']
+        completed_fields = sum(1 for field in total_fields if data.get(field))
+        return (completed_fields / len(total_fields)) * 100
+    
     def get_display_name(self) -> str:
         """Get user's display name."""
-        return self.real_name or f"User_{self.user_id}"
+        return self._display_name(self.real_name, self.user_id)
     
     def get_profile_completeness(self) -> float:
         """Calculate profile completeness percentage."""
-        total_fields = ['real_name', 'email', 'bio', 'location', 'avatar_base64']
-        completed_fields = 0
-        
-        for field in total_fields:
-            if getattr(self, field, None):
-                completed_fields += 1
-        
-        return (completed_fields / len(total_fields)) * 100
+        return self._profile_completeness({
+            field: getattr(self, field, None)
+            for field in ('real_name', 'email', 'bio', 'location', 'avatar_base64')
+        })
     
     def update_last_login(self) -> None:
         """Update the last login timestamp."""
@@ -152,14 +200,20 @@ class RegisteredUser(BaseModel):
             self.save()
     
     @classmethod
-    def get_by_discord_id(cls, user_id: int, guild_id: int) -> Optional['RegisteredUser']:
-        """Get user by Discord user_id and guild_id."""
-        return cls.objects(user_id=user_id, guild_id=guild_id).first()
+    def get_by_discord_id(cls, user_id: int, guild_id: int, fields: Optional[Iterable[str]] = None) -> Optional['RegisteredUser']:
+        """Get user by Discord user_id and guild_id, optionally loading only the given fields."""
+        queryset = cls.objects(user_id=user_id, guild_id=guild_id)
+        if fields:
+            queryset = queryset.only(*fields)
+        return queryset.first()
     
     @classmethod
-    def get_by_email(cls, email: str) -> Optional['RegisteredUser']:
-        """Get user by email address."""
-        return cls.objects(email=email).first()
+    def get_by_email(cls, email: str, fields: Optional[Iterable[str]] = None) -> Optional['RegisteredUser']:
+        """Get user by email address, optionally loading only the given fields."""
+        queryset = cls.objects(email=email)
+        if fields:
+            queryset = queryset.only(*fields)
+        return queryset.first()
     
     @classmethod
     def get_active_users(cls, limit: int = 100, offset: int = 0) -> List['RegisteredUser']:
@@ -167,14 +221,22 @@ class RegisteredUser(BaseModel):
         return list(cls.objects(is_active=True).skip(offset).limit(limit))
     
     @classmethod
-    def search_by_name(cls, name: str, limit: int = 20) -> List['RegisteredUser']:
-        """Search users by name (case-insensitive)."""
-        return list(cls.objects(real_name__icontains=name, is_active=True).limit(limit))
-    
-    @classmethod
-    def get_by_tag(cls, tag: str, limit: int = 50) -> List['RegisteredUser']:
-        """Get users by tag."""
-        return list(cls.objects(tags=tag, is_active=True).limit(limit))
+    def search_by_name(cls, name: str, limit: int = 20, as_pymongo: bool = False) -> List[Any]:
+        """
+        Search users by name (case-insensitive). Returns raw documents when as_pymongo is set.
+        
+        Terms of TEXT_SEARCH_MIN_LENGTH or more use the real_name text index; shorter
+        terms are a prefix range seek on the case-insensitive real_name index.
+        """
+        if len(name) >= cls.TEXT_SEARCH_MIN_LENGTH:
+            queryset = cls.objects(is_active=True).search_text(name)
+        else:
+            # U+FFFF sorts after every character under ICU collation, closing the prefix range
+            queryset = cls.objects(
+                real_name__gte=name, real_name__lt=name + '\uffff', is_active=True
+            ).collation(cls.NAME_COLLATION)
+        queryset = queryset.limit(limit)
+        return list(queryset.as_pymongo() if as_pymongo else queryset)
     
     def __str__(self):
         return f"RegisteredUser(user_id={self.user_id}, email={self.email}, active={self.is_active})"
@@ -1,18 +1,22 @@
 from fastapi import APIRouter, HTTPException, status, Query, Path, Depends, Header
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional, Union
 from datetime import datetime
+from email.utils import format_datetime
+from pydantic import ValidationError
 
 from app.schemas.user import (
     UserCreate, UserUpdate, UserResponse, UserPublicResponse, UserQuery, 
-    APIResponse, PaginatedResponse, UserTagOperation, UserBulkUpdate, 
-    UserStatistics
+    APIResponse, PaginatedResponse, UserTagOperation, UserTagsUpdate, UserActions, UserBulkUpdate, MAX_USER_TAGS,
+    UserStatistics, UserBatchGet, UserBulkIndividualUpdate, UserBulkFilterUpdate
 )
+from app.models.user import RegisteredUser
 from app.services.user_service import UserService
 from app.services.avatar_service import AvatarService
 from app.core.security import api_auth_dependency
 from app.core.config import settings
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["User Management"])
@@ -29,10 +33,18 @@ def create_response(success: bool, message: str, data=None, error_code=None) ->
     )
     return response
 
-def create_paginated_response(success: bool, message: str, data=None, total=0, limit=10, offset=0) -> PaginatedResponse:
-    """Create standardized paginated API response."""
-    has_next = (offset + limit) < total
-    has_previous = offset > 0
+def create_paginated_response(success: bool, message: str, data=None, total=0, limit=10, offset=0,
+                              next_cursor: Optional[str] = None, cursor: Optional[str] = None) -> PaginatedResponse:
+    """Create standardized paginated API response.
+    
+    cursor is the cursor the page was requested with. When a cursor is used or returned,
+    has_next follows next_cursor instead of offset arithmetic.
+    """
+    if cursor or next_cursor:
+        has_next = next_cursor is not None
+    else:
+        has_next = (offset + limit) < total
+    has_previous = bool(cursor) or offset > 0
     
     response = PaginatedResponse(
         success=success,
@@ -44,11 +56,20 @@ def create_paginated_response(success: bool, message: str, data=None, total=0, l
             "limit": limit,
             "offset": offset,
             "has_next": has_next,
-            "has_previous": has_previous
+            "has_previous": has_previous,
+            "next_cursor": next_cursor
         }
     )
     return response
 
+def create_json_response(response: APIResponse, status_code: int = status.HTTP_200_OK) -> Response:
+    """Serialize a response model straight to JSON bytes, bypassing response_model re-validation."""
+    return Response(
+        content=response.model_dump_json(),
+        media_type="application/json",
+        status_code=status_code
+    )
+
 # User CRUD Operations
 
 @router.post("/", 
@@ -56,9 +77,41 @@ def create_paginated_response(success: bool, message: str, data=None, total=0, l
              status_code=status.HTTP_201_CREATED,
              summary="Create a new user",
              description="Create a new user with Discord ID, email, and profile information")
-async def create_user(user_data: UserCreate):
+def create_user(
+    user_data: UserCreate,
+    upsert: bool = Query(False, description="Return the existing user (200) instead of 409 when the Discord ID is taken")
+):
     """Create a new user."""
     try:
+        if upsert:
+            user, outcome = UserService.get_or_create_user(user_data)
+            if outcome == 'created':
+                return create_json_response(create_response(
+                    success=True,
+                    message="User created successfully",
+                    data=user.to_dict()
+                ), status_code=status.HTTP_201_CREATED)
+            if outcome == 'exists':
+                return create_json_response(create_response(
+                    success=True,
+                    message="User already exists",
+                    data=user.to_dict()
+                ))
+            if outcome == 'conflict':
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Email already belongs to another user"
+                )
+            if outcome == 'invalid':
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="User data failed validation"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error"
+            )
+        
         user = UserService.create_user(user_data)
         if user:
             return create_response(
@@ -84,7 +137,7 @@ async def create_user(user_data: UserCreate):
             response_model=APIResponse,
             summary="Get user by ID",
             description="Retrieve a user by their MongoDB ObjectId")
-async def get_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
+def get_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
     """Get user by MongoDB ObjectId."""
     try:
         user = UserService.get_user_by_id(user_id)
@@ -112,7 +165,7 @@ async def get_user(user_id: str = Path(..., description="User MongoDB ObjectId")
             response_model=APIResponse,
             summary="Get public user information",
             description="Retrieve public information about a user (limited fields)")
-async def get_user_public(user_id: str = Path(..., description="User MongoDB ObjectId")):
+def get_user_public(user_id: str = Path(..., description="User MongoDB ObjectId")):
     """Get public user information (limited fields)."""
     try:
         user = UserService.get_user_by_id(user_id)
@@ -140,15 +193,15 @@ async def get_user_public(user_id: str = Path(..., description="User MongoDB Obj
             response_model=APIResponse,
             summary="Get user by email",
             description="Retrieve a user by their email address")
-async def get_user_by_email(email: str = Path(..., description="User email address")):
+def get_user_by_email(email: str = Path(..., description="User email address")):
     """Get user by email address."""
     try:
-        user = UserService.get_user_by_email(email)
-        if user:
+        user_data = UserService.get_user_dict_by_email(email)
+        if user_data:
             return create_response(
                 success=True,
                 message="User found",
-                data=user.to_dict()
+                data=user_data
             )
         else:
             raise HTTPException(
@@ -168,18 +221,18 @@ async def get_user_by_email(email: str = Path(..., description="User email addre
             response_model=APIResponse,
             summary="Get user by Discord IDs",
             description="Retrieve a user by their Discord user_id and guild_id")
-async def get_user_by_discord_id(
+def get_user_by_discord_id(
     user_id: int = Path(..., description="Discord user ID"),
     guild_id: int = Path(..., description="Discord guild ID")
 ):
     """Get user by Discord user_id and guild_id."""
     try:
-        user = UserService.get_user_by_user_id(user_id, guild_id)
-        if user:
+        user_data = UserService.get_user_dict_by_user_id(user_id, guild_id)
+        if user_data:
             return create_response(
                 success=True,
                 message="User found",
-                data=user.to_dict()
+                data=user_data
             )
         else:
             raise HTTPException(
@@ -199,13 +252,14 @@ async def get_user_by_discord_id(
             response_model=APIResponse,
             summary="Update user",
             description="Update user information by MongoDB ObjectId")
-async def update_user(
+def update_user(
     user_data: UserUpdate,
     user_id: str = Path(..., description="User MongoDB ObjectId")
 ):
     """Update user information."""
     try:
-        user = UserService.update_user(user_id, user_data)
+        update_dict = user_data.model_dump(mode='python', exclude_unset=True)
+        user = UserService.update_user(user_id, update_dict)
         if user:
             return create_response(
                 success=True,
@@ -230,7 +284,7 @@ async def update_user(
                response_model=APIResponse,
                summary="Delete user",
                description="Permanently delete a user by MongoDB ObjectId")
-async def delete_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
+def delete_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
     """Delete user by id."""
     try:
         success = UserService.delete_user(user_id)
@@ -259,7 +313,7 @@ async def delete_user(user_id: str = Path(..., description="User MongoDB ObjectI
               response_model=APIResponse,
               summary="Deactivate user",
               description="Deactivate a user account (soft delete)")
-async def deactivate_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
+def deactivate_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
     """Deactivate user account."""
     try:
         success = UserService.deactivate_user(user_id)
@@ -286,7 +340,7 @@ async def deactivate_user(user_id: str = Path(..., description="User MongoDB Obj
               response_model=APIResponse,
               summary="Activate user",
               description="Activate a deactivated user account")
-async def activate_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
+def activate_user(user_id: str = Path(..., description="User MongoDB ObjectId")):
     """Activate user account."""
     try:
         success = UserService.activate_user(user_id)
@@ -313,7 +367,7 @@ async def activate_user(user_id: str = Path(..., description="User MongoDB Objec
               response_model=APIResponse,
               summary="Update login timestamp",
               description="Update user's last login timestamp")
-async def update_user_login(user_id: str = Path(..., description="User MongoDB ObjectId")):
+def update_user_login(user_id: str = Path(..., description="User MongoDB ObjectId")):
     """Update user's last login timestamp."""
     try:
         success = UserService.update_user_login(user_id)
@@ -336,13 +390,45 @@ async def update_user_login(user_id: str = Path(..., description="User MongoDB O
             detail="Internal server error"
         )
 
+@router.post("/{user_id}/actions", 
+             response_model=APIResponse,
+             summary="Apply user actions",
+             description="Apply several login/deactivate/activate actions to a user in one request")
+def apply_user_actions(
+    actions_data: UserActions,
+    user_id: str = Path(..., description="User MongoDB ObjectId")
+):
+    """Apply account actions to user."""
+    try:
+        ops = [action.op for action in actions_data.actions]
+        success = UserService.apply_user_actions(user_id, ops)
+        if success:
+            return create_response(
+                success=True,
+                message=f"Applied {len(ops)} actions successfully",
+                data={"applied": ops}
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in apply_user_actions endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 # Tag Management
 
 @router.post("/{user_id}/tags", 
              response_model=APIResponse,
              summary="Add user tag",
              description="Add a tag to a user")
-async def add_user_tag(
+def add_user_tag(
     tag_data: UserTagOperation,
     user_id: str = Path(..., description="User MongoDB ObjectId")
 ):
@@ -368,11 +454,56 @@ async def add_user_tag(
             detail="Internal server error"
         )
 
+@router.patch("/{user_id}/tags", 
+              response_model=APIResponse,
+              summary="Update user tags",
+              description="Add and remove several tags from a user in one request")
+def update_user_tags(
+    tags_data: UserTagsUpdate,
+    user_id: str = Path(..., description="User MongoDB ObjectId")
+):
+    """Add and remove user tags."""
+    if not tags_data.add and not tags_data.remove:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing to add or remove"
+        )
+    
+    try:
+        outcome = UserService.update_user_tags(user_id, tags_data.add, tags_data.remove)
+        if outcome == 'updated':
+            return create_response(
+                success=True,
+                message=f"Added {len(tags_data.add)} and removed {len(tags_data.remove)} tags"
+            )
+        if outcome == 'not_found':
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        if outcome == 'too_many':
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Users can have at most {MAX_USER_TAGS} tags"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update tags"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in update_user_tags endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @router.delete("/{user_id}/tags", 
                response_model=APIResponse,
                summary="Remove user tag",
                description="Remove a tag from a user")
-async def remove_user_tag(
+def remove_user_tag(
     tag_data: UserTagOperation,
     user_id: str = Path(..., description="User MongoDB ObjectId")
 ):
@@ -404,7 +535,7 @@ async def remove_user_tag(
              response_model=PaginatedResponse,
              summary="Query users",
              description="Query users with advanced filters and pagination")
-async def query_users(query: UserQuery):
+def query_users(query: UserQuery):
     """Query users with filters and pagination."""
     try:
         users = UserService.query_users(query)
@@ -412,18 +543,20 @@ async def query_users(query: UserQuery):
         
         # Convert to appropriate response format
         if query.public_only:
-            users_data = [user.to_public_dict() for user in users]
+            users_data = [RegisteredUser.son_to_public_dict(doc) for doc in users]
         else:
-            users_data = [user.to_dict() for user in users]
+            users_data = [RegisteredUser.son_to_dict(doc) for doc in users]
         
-        return create_paginated_response(
+        return create_json_response(create_paginated_response(
             success=True,
             message=f"Found {len(users)} users",
             data=users_data,
             total=total_count,
             limit=query.limit,
-            offset=query.offset
-        )
+            offset=query.offset,
+            next_cursor=UserService.get_next_cursor(query, users),
+            cursor=query.cursor
+        ))
     except Exception as e:
         logger.error(f"Error in query_users endpoint: {str(e)}")
         raise HTTPException(
@@ -435,37 +568,49 @@ async def query_users(query: UserQuery):
             response_model=PaginatedResponse,
             summary="List users",
             description="List users with pagination")
-async def list_users(
+def list_users(
     limit: int = Query(10, ge=1, le=100, description="Number of users to return"),
     offset: int = Query(0, ge=0, description="Number of users to skip"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (replaces offset)"),
     active_only: bool = Query(False, description="Return only active users"),
     public_only: bool = Query(False, description="Return only public information")
 ):
-    """List users with pagination."""
+    """List users with pagination, newest registrations first."""
     try:
         query = UserQuery(
             limit=limit, 
             offset=offset, 
             is_active=active_only if active_only else None,
+            order_by='-registered_at',
+            cursor=cursor,
             public_only=public_only
         )
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    try:
         users = UserService.query_users(query)
         total_count = UserService.get_user_count(active_only=active_only)
         
         # Convert to appropriate response format
         if public_only:
-            users_data = [user.to_public_dict() for user in users]
+            users_data = [RegisteredUser.son_to_public_dict(doc) for doc in users]
         else:
-            users_data = [user.to_dict() for user in users]
+            users_data = [RegisteredUser.son_to_dict(doc) for doc in users]
         
-        return create_paginated_response(
+        return create_json_response(create_paginated_response(
             success=True,
             message=f"Retrieved {len(users)} users",
             data=users_data,
             total=total_count,
             limit=limit,
-            offset=offset
-        )
+            offset=offset,
+            next_cursor=UserService.get_next_cursor(query, users),
+            cursor=query.cursor
+        ))
     except Exception as e:
         logger.error(f"Error in list_users endpoint: {str(e)}")
         raise HTTPException(
@@ -477,20 +622,20 @@ async def list_users(
             response_model=APIResponse,
             summary="Search users by name",
             description="Search users by name (case-insensitive)")
-async def search_users_by_name(
+def search_users_by_name(
     name: str = Path(..., description="Name to search for"),
     limit: int = Query(20, ge=1, le=100, description="Maximum number of results")
 ):
     """Search users by name."""
     try:
         users = UserService.search_users_by_name(name, limit)
-        users_data = [user.to_public_dict() for user in users]
+        users_data = [RegisteredUser.son_to_public_dict(doc) for doc in users]
         
-        return create_response(
+        return create_json_response(create_response(
             success=True,
             message=f"Found {len(users)} users matching '{name}'",
             data=users_data
-        )
+        ))
     except Exception as e:
         logger.error(f"Error in search_users_by_name endpoint: {str(e)}")
         raise HTTPException(
@@ -499,23 +644,39 @@ async def search_users_by_name(
         )
 
 @router.get("/tag/{tag}", 
-            response_model=APIResponse,
+            response_model=PaginatedResponse,
             summary="Get users by tag",
-            description="Get users that have a specific tag")
-async def get_users_by_tag(
+            description="Get active users that have a specific tag, newest registrations first")
+def get_users_by_tag(
     tag: str = Path(..., description="Tag to search for"),
-    limit: int = Query(50, ge=1, le=100, description="Maximum number of results")
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of results"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """Get users by tag."""
     try:
-        users = UserService.get_users_by_tag(tag, limit)
-        users_data = [user.to_public_dict() for user in users]
+        query = UserQuery(tag=tag, is_active=True, limit=limit, cursor=cursor, order_by='-registered_at')
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    try:
+        # Served by the (tags, -registered_at, -_id) index and bounded to limit documents
+        users = UserService.query_users(query)
+        users_data = [RegisteredUser.son_to_public_dict(doc) for doc in users]
+        total_count = UserService.get_user_count(active_only=True, tag=tag)
         
-        return create_response(
+        return create_json_response(create_paginated_response(
             success=True,
             message=f"Found {len(users)} users with tag '{tag}'",
-            data=users_data
-        )
+            data=users_data,
+            total=total_count,
+            limit=limit,
+            offset=0,
+            next_cursor=UserService.get_next_cursor(query, users),
+            cursor=cursor
+        ))
     except Exception as e:
         logger.error(f"Error in get_users_by_tag endpoint: {str(e)}")
         raise HTTPException(
@@ -529,7 +690,7 @@ async def get_users_by_tag(
             response_model=APIResponse,
             summary="Get user statistics",
             description="Get comprehensive user statistics for analytics")
-async def get_user_statistics():
+def get_user_statistics():
     """Get user statistics."""
     try:
         stats = UserService.get_user_statistics()
@@ -547,14 +708,41 @@ async def get_user_statistics():
 
 # Bulk Operations
 
+@router.post("/batch", 
+             response_model=APIResponse,
+             summary="Get users by IDs",
+             description="Retrieve multiple users by MongoDB ObjectId in a single request")
+def get_users_by_ids(batch: UserBatchGet):
+    """Get multiple users by ID with one database query."""
+    try:
+        users = UserService.get_users_by_ids(batch.user_ids)
+        
+        # Convert to appropriate response format
+        if batch.public_only:
+            users_data = [RegisteredUser.son_to_public_dict(doc) for doc in users]
+        else:
+            users_data = [RegisteredUser.son_to_dict(doc) for doc in users]
+        
+        return create_json_response(create_response(
+            success=True,
+            message=f"Found {len(users)} of {len(batch.user_ids)} users",
+            data=users_data
+        ))
+    except Exception as e:
+        logger.error(f"Error in get_users_by_ids endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @router.put("/bulk", 
             response_model=APIResponse,
             summary="Bulk update users",
             description="Update multiple users at once")
-async def bulk_update_users(bulk_data: UserBulkUpdate):
+def bulk_update_users(bulk_data: UserBulkUpdate):
     """Bulk update multiple users."""
     try:
-        update_dict = bulk_data.update_data.model_dump(exclude_unset=True)
+        update_dict = bulk_data.update_data.model_dump(mode='python', exclude_unset=True)
         updated_count = UserService.bulk_update_users(bulk_data.user_ids, update_dict)
         
         return create_response(
@@ -569,12 +757,59 @@ async def bulk_update_users(bulk_data: UserBulkUpdate):
             detail="Internal server error"
         )
 
+@router.put("/bulk/individual", 
+            response_model=APIResponse,
+            summary="Bulk update users individually",
+            description="Update multiple users at once, each with its own data")
+def bulk_update_users_individually(bulk_data: UserBulkIndividualUpdate):
+    """Bulk update multiple users with per-user data."""
+    try:
+        updates = [
+            (item.user_id, item.update_data.model_dump(mode='python', exclude_unset=True))
+            for item in bulk_data.updates
+        ]
+        updated_count = UserService.bulk_update_users_individually(updates)
+        
+        return create_response(
+            success=True,
+            message=f"Successfully updated {updated_count} users",
+            data={"updated_count": updated_count}
+        )
+    except Exception as e:
+        logger.error(f"Error in bulk_update_users_individually endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.post("/bulk_update_by_filter", 
+             response_model=APIResponse,
+             summary="Bulk update users by filter",
+             description="Update the users matched by a query without listing them first")
+def bulk_update_users_by_filter(bulk_data: UserBulkFilterUpdate):
+    """Bulk update the users matched by a query."""
+    try:
+        update_dict = bulk_data.update.model_dump(mode='python', exclude_unset=True)
+        updated_count = UserService.bulk_update_users_by_filter(bulk_data.filter, update_dict)
+        
+        return create_response(
+            success=True,
+            message=f"Successfully updated {updated_count} users",
+            data={"updated_count": updated_count}
+        )
+    except Exception as e:
+        logger.error(f"Error in bulk_update_users_by_filter endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 # Avatar Operations
 
 @router.get("/{user_id}/avatar",
             summary="Get user avatar",
             description="Get user avatar image with optimized caching and HTTP headers")
-async def get_user_avatar(
+def get_user_avatar(
     user_id: str = Path(..., description="User MongoDB ObjectId"),
     if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
     if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since")
@@ -586,29 +821,38 @@ async def get_user_avatar(
     - ETag validation for efficient caching
     - Last-Modified header for conditional requests
     - Automatic content type detection
-    - In-memory caching to reduce database load
+    - In-memory metadata and shared on-disk caching to reduce database load
     - HTTP 304 Not Modified responses
     """
     try:
-        avatar_data, etag, last_modified, content_type = AvatarService.get_user_avatar(
+        avatar, etag, last_modified, content_type = AvatarService.get_user_avatar(
             user_id, if_none_match, if_modified_since
         )
         
         # Return 304 Not Modified if no changes
-        if avatar_data is None:
+        if avatar is None:
             response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
             if etag and settings.AVATAR_ENABLE_ETAG:
                 response.headers["ETag"] = f'"{etag}"'
             if last_modified and settings.AVATAR_ENABLE_LAST_MODIFIED:
-                response.headers["Last-Modified"] = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+                response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
             return response
         
-        # Return avatar with optimized headers
-        response = Response(
-            content=avatar_data,
-            media_type=content_type or "image/jpeg",
-            status_code=status.HTTP_200_OK
-        )
+        if isinstance(avatar, bytes):
+            # Caching disabled: send the freshly decoded bytes
+            response = Response(
+                content=avatar,
+                media_type=content_type or "image/jpeg",
+                status_code=status.HTTP_200_OK
+            )
+        else:
+            # Stream from the handle opened by the service so a concurrent eviction can't remove it mid-response
+            response = StreamingResponse(
+                AvatarService.iter_avatar_file(avatar),
+                media_type=content_type or "image/jpeg",
+                status_code=status.HTTP_200_OK,
+                headers={"Content-Length": str(os.fstat(avatar.fileno()).st_size)}
+            )
         
         # Add caching headers for optimization
         if settings.AVATAR_CACHE_CONTROL_MAX_AGE > 0:
@@ -618,7 +862,7 @@ async def get_user_avatar(
             response.headers["ETag"] = f'"{etag}"'
         
         if last_modified and settings.AVATAR_ENABLE_LAST_MODIFIED:
-            response.headers["Last-Modified"] = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+            response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
         
         # Add security headers
         response.headers["X-Content-Type-Options"] = "nosniff"
@@ -651,7 +895,7 @@ async def get_user_avatar(
                response_model=APIResponse,
                summary="Clear user avatar cache",
                description="Clear cached avatar data for a specific user")
-async def clear_user_avatar_cache(
+def clear_user_avatar_cache(
     user_id: str = Path(..., description="User MongoDB ObjectId")
 ):
     """Clear avatar cache for a specific user."""
@@ -672,7 +916,7 @@ async def clear_user_avatar_cache(
             response_model=APIResponse,
             summary="Get avatar cache statistics",
             description="Get statistics about the avatar cache system")
-async def get_avatar_cache_stats():
+def get_avatar_cache_stats():
     """Get avatar cache statistics."""
     try:
         stats = AvatarService.get_cache_stats()
@@ -692,7 +936,7 @@ async def get_avatar_cache_stats():
                response_model=APIResponse,
                summary="Clear all avatar cache",
                description="Clear all cached avatar data (admin operation)")
-async def clear_all_avatar_cache():
+def clear_all_avatar_cache():
     """Clear all avatar cache (admin operation)."""
     try:
         AvatarService.clear_cache()
@@ -1,62 +1,82 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List, Union
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, create_model, validator
+from pydantic.fields import FieldInfo
+from typing import Optional, List, Literal, Tuple, Union
 from datetime import datetime
+from bson import ObjectId
+import base64
+import re
 
-class UserBase(BaseModel):
-    """Base schema for user data."""
-    user_id: int = Field(..., description="Discord user ID", gt=0)
-    guild_id: int = Field(..., description="Discord guild/server ID", gt=0)
-    real_name: str = Field(..., description="User's real name", min_length=1, max_length=100)
-    email: EmailStr = Field(..., description="User's email address")
-    source: Optional[str] = Field(None, description="Registration source", max_length=200)
-    education_stage: Optional[str] = Field(None, description="Current education level", max_length=50)
-    avatar_base64: Optional[str] = Field(None, description="Base64 encoded user avatar")
-    
-    # Additional profile fields
-    bio: Optional[str] = Field(None, description="User biography", max_length=500)
-    location: Optional[str] = Field(None, description="User location", max_length=100)
-    website: Optional[str] = Field(None, description="Personal website URL", max_length=200)
-    github_username: Optional[str] = Field(None, description="GitHub username", max_length=50)
-    linkedin_url: Optional[str] = Field(None, description="LinkedIn profile URL", max_length=200)
-    
-    # System fields
-    is_active: Optional[bool] = Field(True, description="Whether the user account is active")
-    is_verified: Optional[bool] = Field(False, description="Whether the user email is verified")
-    tags: Optional[List[str]] = Field(None, description="User tags for categorization")
+# Allowed values for UserQuery.order_by (prefix with '-' for descending)
+OrderBy = Literal[
+    'registered_at', 'real_name', 'email', 'last_updated', 'last_login',
+    '-registered_at', '-real_name', '-email', '-last_updated', '-last_login'
+]
 
-    @validator('website', 'linkedin_url')
+# order_by values that page by (registered_at, _id) newest first and so support cursors
+KEYSET_ORDER_BY = (None, 'registered_at', '-registered_at')
+
+def encode_user_cursor(registered_at: datetime, object_id: ObjectId) -> str:
+    """Encode a (registered_at, _id) keyset position as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{registered_at.isoformat()}|{object_id}".encode()).decode()
+
+def decode_user_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_user_cursor. Raises ValueError if it is malformed."""
+    try:
+        registered_at, object_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(registered_at), ObjectId(object_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+# Allow alphanumeric, spaces, hyphens, and underscores
+_TAG_PATTERN = re.compile(r'^[a-zA-Z0-9\s\-_]+$')
+
+# Maximum number of tags a user can hold
+MAX_USER_TAGS = 10
+
+def validate_tag(v: str) -> str:
+    """Validate a single (already stripped) tag."""
+    if not v:
+        raise ValueError('Tag cannot be empty')
+    if len(v) > 50:
+        raise ValueError('Tag must be at most 50 characters')
+    if not _TAG_PATTERN.match(v):
+        raise ValueError('Tag can only contain letters, numbers, spaces, hyphens, and underscores')
+    return v
+
+class UserFieldValidators(BaseModel):
+    """Shared configuration and profile field validators for user schemas."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
+    @validator('website', 'linkedin_url', check_fields=False)
     def validate_urls(cls, v):
         """Validate URL format."""
         if v and not (v.startswith('http://') or v.startswith('https://')):
             return f'https://{v}'
         return v
 
-    @validator('github_username')
+    @validator('github_username', check_fields=False)
     def validate_github_username(cls, v):
         """Validate GitHub username format."""
         if v and not v.replace('_', '').replace('-', '').isalnum():
             raise ValueError('GitHub username can only contain alphanumeric characters, hyphens, and underscores')
         return v
 
-    @validator('tags')
+    @validator('tags', check_fields=False)
     def validate_tags(cls, v):
         """Validate tags format."""
         if v:
-            # Remove duplicates and empty strings
-            v = list(set([tag.strip() for tag in v if tag.strip()]))
-            # Limit to 10 tags
-            if len(v) > 10:
-                raise ValueError('Maximum 10 tags allowed')
+            # Remove duplicates and empty strings (whitespace already stripped)
+            v = list({tag for tag in v if tag})
+            if len(v) > MAX_USER_TAGS:
+                raise ValueError(f'Maximum {MAX_USER_TAGS} tags allowed')
         return v
 
-class UserCreate(UserBase):
-    """Schema for creating a new user."""
-    pass
-
-class UserUpdate(BaseModel):
-    """Schema for updating an existing user."""
-    real_name: Optional[str] = Field(None, description="User's real name", min_length=1, max_length=100)
-    email: Optional[EmailStr] = Field(None, description="User's email address")
+class UserBase(UserFieldValidators):
+    """Base schema for user data."""
+    user_id: int = Field(..., description="Discord user ID", gt=0)
+    guild_id: int = Field(..., description="Discord guild/server ID", gt=0)
+    real_name: str = Field(..., description="User's real name", min_length=1, max_length=100)
+    email: EmailStr = Field(..., description="User's email address")
     source: Optional[str] = Field(None, description="Registration source", max_length=200)
     education_stage: Optional[str] = Field(None, description="Current education level", max_length=50)
     avatar_base64: Optional[str] = Field(None, description="Base64 encoded user avatar")
@@ -69,34 +89,27 @@ class UserUpdate(BaseModel):
     linkedin_url: Optional[str] = Field(None, description="LinkedIn profile URL", max_length=200)
     
     # System fields
-    is_active: Optional[bool] = Field(None, description="Whether the user account is active")
-    is_verified: Optional[bool] = Field(None, description="Whether the user email is verified")
+    is_active: Optional[bool] = Field(True, description="Whether the user account is active")
+    is_verified: Optional[bool] = Field(False, description="Whether the user email is verified")
     tags: Optional[List[str]] = Field(None, description="User tags for categorization")
 
-    @validator('website', 'linkedin_url')
-    def validate_urls(cls, v):
-        """Validate URL format."""
-        if v and not (v.startswith('http://') or v.startswith('https://')):
-            return f'https://{v}'
-        return v
-
-    @validator('github_username')
-    def validate_github_username(cls, v):
-        """Validate GitHub username format."""
-        if v and not v.replace('_', '').replace('-', '').isalnum():
-            raise ValueError('GitHub username can only contain alphanumeric characters, hyphens, and underscores')
-        return v
+class UserCreate(UserBase):
+    """Schema for creating a new user."""
+    pass
 
-    @validator('tags')
-    def validate_tags(cls, v):
-        """Validate tags format."""
-        if v:
-            # Remove duplicates and empty strings
-            v = list(set([tag.strip() for tag in v if tag.strip()]))
-            # Limit to 10 tags
-            if len(v) > 10:
-                raise ValueError('Maximum 10 tags allowed')
-        return v
+# Schema for updating an existing user: every UserBase field except the Discord
+# identifiers, made optional with a None default (constraints are kept).
+UserUpdate = create_model(
+    'UserUpdate',
+    __base__=UserFieldValidators,
+    __module__=__name__,
+    **{
+        name: (Optional[field.annotation], FieldInfo.merge_field_infos(field, default=None))
+        for name, field in UserBase.model_fields.items()
+        if name not in ('user_id', 'guild_id')
+    }
+)
+UserUpdate.__doc__ = "Schema for updating an existing user."
 
 class UserResponse(UserBase):
     """Schema for user response."""
@@ -107,11 +120,13 @@ class UserResponse(UserBase):
     display_name: Optional[str] = Field(None, description="User's display name")
     profile_completeness: Optional[float] = Field(None, description="Profile completeness percentage")
 
-    class Config:
-        from_attributes = True
+    # Request-only settings inherited from UserBase don't apply to responses
+    model_config = ConfigDict(from_attributes=True, extra='ignore', str_strip_whitespace=False)
 
 class UserPublicResponse(BaseModel):
     """Schema for public user information (limited fields)."""
+    model_config = ConfigDict(from_attributes=True)
+
     id: str = Field(..., description="MongoDB ObjectId")
     real_name: str = Field(..., description="User's real name")
     bio: Optional[str] = Field(None, description="User biography")
@@ -123,11 +138,10 @@ class UserPublicResponse(BaseModel):
     registered_at: Optional[str] = Field(None, description="Registration timestamp (ISO format)")
     display_name: Optional[str] = Field(None, description="User's display name")
 
-    class Config:
-        from_attributes = True
-
 class UserQuery(BaseModel):
     """Schema for user query parameters with enhanced filters."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
     # Basic filters
     email: Optional[EmailStr] = Field(None, description="Filter by email address")
     user_id: Optional[int] = Field(None, description="Filter by Discord user ID")
@@ -150,43 +164,90 @@ class UserQuery(BaseModel):
     # Pagination and ordering
     limit: Optional[int] = Field(10, description="Number of results to return", ge=1, le=100)
     offset: Optional[int] = Field(0, description="Number of results to skip", ge=0)
-    order_by: Optional[str] = Field(None, description="Field to order by (prefix with '-' for descending)")
+    order_by: Optional[OrderBy] = Field(None, description="Field to order by (prefix with '-' for descending)")
+    cursor: Optional[str] = Field(None, description="next_cursor from the previous page; pages newest first by registration instead of using offset")
     
     # Response format
     public_only: Optional[bool] = Field(False, description="Return only public user information")
 
-    @validator('order_by')
-    def validate_order_by(cls, v):
-        """Validate order_by field."""
-        if v:
-            valid_fields = [
-                'registered_at', 'real_name', 'email', 'last_updated', 'last_login',
-                '-registered_at', '-real_name', '-email', '-last_updated', '-last_login'
-            ]
-            if v not in valid_fields:
-                raise ValueError(f'order_by must be one of: {valid_fields}')
+    @validator('cursor')
+    def validate_cursor(cls, v, values):
+        """Validate cursor format; cursors only work with registration-time ordering."""
+        if v is not None:
+            decode_user_cursor(v)
+            if values.get('order_by') not in KEYSET_ORDER_BY:
+                raise ValueError('Cursor pagination requires ordering by registered_at')
         return v
 
 class UserTagOperation(BaseModel):
     """Schema for user tag operations."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
     tag: str = Field(..., description="Tag to add or remove", min_length=1, max_length=50)
 
     @validator('tag')
     def validate_tag_format(cls, v):
         """Validate tag format."""
-        if not v.strip():
-            raise ValueError('Tag cannot be empty')
-        # Allow alphanumeric, spaces, hyphens, and underscores
-        import re
-        if not re.match(r'^[a-zA-Z0-9\s\-_]+$', v):
-            raise ValueError('Tag can only contain letters, numbers, spaces, hyphens, and underscores')
-        return v.strip()
+        return validate_tag(v)
+
+class UserTagsUpdate(BaseModel):
+    """Schema for adding and removing several user tags at once."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
+    add: List[str] = Field(default_factory=list, description="Tags to add", max_items=50)
+    remove: List[str] = Field(default_factory=list, description="Tags to remove (applied before additions)", max_items=50)
+
+    @validator('add', 'remove', each_item=True)
+    def validate_tag_format(cls, v):
+        """Validate tag format."""
+        return validate_tag(v)
+
+class UserAction(BaseModel):
+    """A single account action in a user actions batch."""
+    model_config = ConfigDict(extra='forbid')
+
+    op: Literal['login', 'deactivate', 'activate'] = Field(..., description="Action to apply")
+
+class UserActions(BaseModel):
+    """Schema for applying several account actions to one user in one request."""
+    model_config = ConfigDict(extra='forbid', validate_default=False)
+
+    actions: List[UserAction] = Field(..., description="Actions to apply, in order", min_items=1, max_items=20)
 
 class UserBulkUpdate(BaseModel):
     """Schema for bulk user updates."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
     user_ids: List[str] = Field(..., description="List of user IDs to update", min_items=1, max_items=100)
     update_data: UserUpdate = Field(..., description="Data to update for all users")
 
+class UserBulkFilterUpdate(BaseModel):
+    """Schema for updating every user matched by a query in one request."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
+    filter: UserQuery = Field(..., description="Query selecting the users to update (limit caps the batch size)")
+    update: UserUpdate = Field(..., description="Data to update for the matched users")
+
+class UserBulkItemUpdate(BaseModel):
+    """Schema for a single user's changes within an individualized bulk update."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
+    user_id: str = Field(..., description="User MongoDB ObjectId")
+    update_data: UserUpdate = Field(..., description="Data to update for this user")
+
+class UserBulkIndividualUpdate(BaseModel):
+    """Schema for bulk updates where each user gets its own changes."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
+    updates: List[UserBulkItemUpdate] = Field(..., description="Per-user updates", min_items=1, max_items=100)
+
+class UserBatchGet(BaseModel):
+    """Schema for fetching multiple users by ID in one request."""
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, validate_default=False)
+
+    user_ids: List[str] = Field(..., description="List of user IDs to fetch", min_items=1, max_items=100)
+    public_only: Optional[bool] = Field(False, description="Return only public user information")
+
 class UserStatistics(BaseModel):
     """Schema for user statistics response."""
     total_users: int = Field(..., description="Total number of users")
@@ -211,18 +272,18 @@ class PaginatedResponse(APIResponse):
     """Paginated API response schema."""
     pagination: dict = Field(..., description="Pagination metadata")
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "success": True,
-                "message": "Users retrieved successfully",
-                "data": [],
-                "pagination": {
-                    "total": 100,
-                    "limit": 10,
-                    "offset": 0,
-                    "has_next": True,
-                    "has_previous": False
-                }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "success": True,
+            "message": "Users retrieved successfully",
+            "data": [],
+            "pagination": {
+                "total": 100,
+                "limit": 10,
+                "offset": 0,
+                "has_next": True,
+                "has_previous": False,
+                "next_cursor": "MjAyNC0wMS0xNVQwODozMDowMHw1MDdmMWY3N2JjZjg2Y2Q3OTk0MzkwMTE="
             }
-        } 
\ No newline at end of file
+        }
+    })
@@ -1,8 +1,13 @@
 import base64
 import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Tuple, Dict, Any
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple, Dict, Any, Union, BinaryIO, Iterator
 from fastapi import HTTPException, status
 from fastapi.responses import Response
 
@@ -14,9 +19,12 @@ logger = logging.getLogger(__name__)
 class AvatarService:
     """Service for handling user avatar operations with caching and optimization."""
     
-    # In-memory cache for avatars (in production, you might want to use Redis)
+    # In-memory cache of avatar metadata; decoded bytes live in the shared on-disk cache
     _cache: Dict[str, Dict[str, Any]] = {}
     
+    # Decoded files this process believes are on disk; None until the directory is first counted
+    _disk_file_count: Optional[int] = None
+    
     @classmethod
     def _generate_etag(cls, avatar_data: str) -> str:
         """Generate ETag from avatar data."""
@@ -25,27 +33,121 @@ class AvatarService:
     @classmethod
     def _is_cache_valid(cls, cache_entry: Dict[str, Any]) -> bool:
         """Check if cache entry is still valid."""
-        if not settings.AVATAR_CACHE_ENABLED:
-            return False
+        return settings.AVATAR_CACHE_ENABLED and time.monotonic() < cache_entry.get('expires_at', 0.0)
+    
+    @classmethod
+    def _get_cache_path(cls, etag: str) -> Path:
+        """Get the content-addressed path of a decoded avatar on disk."""
+        return Path(settings.AVATAR_CACHE_DIR) / f"{etag}.bin"
+    
+    @classmethod
+    def _write_avatar_file(cls, etag: str, avatar_data: bytes) -> Path:
+        """Write decoded avatar bytes to the on-disk cache (shared across workers)."""
+        path = cls._get_cache_path(etag)
+        if path.exists():
+            return path
         
-        cached_at = cache_entry.get('cached_at')
-        if not cached_at:
-            return False
-            
-        expiry_time = cached_at + timedelta(seconds=settings.AVATAR_CACHE_TTL_SECONDS)
-        return datetime.utcnow() < expiry_time
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Write to a temporary file first so concurrent readers never see partial data
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(avatar_data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        logger.debug(f"Wrote avatar file {path}")
+        cls._count_written_file()
+        return path
+    
+    @classmethod
+    def _count_written_file(cls) -> None:
+        """Track a newly written avatar file and evict only once the count passes AVATAR_CACHE_MAX_FILES."""
+        if cls._disk_file_count is None:
+            cls._disk_file_count = sum(1 for _ in Path(settings.AVATAR_CACHE_DIR).glob('*.bin'))
+        else:
+            cls._disk_file_count += 1
+        
+        if cls._disk_file_count > settings.AVATAR_CACHE_MAX_FILES:
+            cls._evict_avatar_files()
+    
+    @classmethod
+    def _evict_avatar_files(cls) -> None:
+        """Delete the oldest decoded avatar files, leaving headroom so the next scan is many writes away."""
+        entries = []
+        for path in Path(settings.AVATAR_CACHE_DIR).glob('*.bin'):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue  # Removed concurrently by another worker
+        
+        # Other workers write to the same directory, so the scan is the authoritative count
+        low_water = settings.AVATAR_CACHE_MAX_FILES - settings.AVATAR_CACHE_MAX_FILES // 10
+        excess = len(entries) - low_water
+        if excess <= 0:
+            cls._disk_file_count = len(entries)
+            return
+        
+        entries.sort()
+        for _, path in entries[:excess]:
+            path.unlink(missing_ok=True)
+        cls._disk_file_count = low_water
+        logger.debug(f"Evicted {excess} avatar files from disk cache")
+    
+    @classmethod
+    def _remove_avatar_file(cls, path: Path) -> None:
+        """Delete a decoded avatar file unless another cached user still points at it."""
+        if any(entry['path'] == path for entry in cls._cache.values()):
+            return
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        if cls._disk_file_count:
+            cls._disk_file_count -= 1
+        logger.debug(f"Removed avatar file {path}")
     
     @classmethod
-    def _add_to_cache(cls, user_id: str, avatar_data: bytes, etag: str, last_modified: datetime) -> None:
-        """Add avatar to cache."""
+    def _open_avatar_file(cls, path: Path) -> Optional[BinaryIO]:
+        """
+        Open a decoded avatar file, or return None if it has been evicted.
+        
+        The open handle keeps the data readable even if another worker unlinks the file
+        before the response has been sent.
+        """
+        try:
+            return path.open('rb')
+        except FileNotFoundError:
+            return None
+    
+    @classmethod
+    def iter_avatar_file(cls, avatar_file: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Stream an open avatar file in chunks, closing it when done."""
+        with avatar_file:
+            while chunk := avatar_file.read(chunk_size):
+                yield chunk
+    
+    @classmethod
+    def _add_to_cache(cls, user_id: str, path: Path, etag: str, last_modified: datetime, content_type: str) -> None:
+        """Add avatar metadata to cache."""
         if not settings.AVATAR_CACHE_ENABLED:
             return
+        
+        previous = cls._cache.pop(user_id, None)
+        if previous and previous['path'] != path:
+            # The avatar changed; its old file is no longer needed
+            cls._remove_avatar_file(previous['path'])
             
         cls._cache[user_id] = {
-            'data': avatar_data,
+            'path': path,
             'etag': etag,
             'last_modified': last_modified,
-            'cached_at': datetime.utcnow()
+            'content_type': content_type,
+            'expires_at': time.monotonic() + settings.AVATAR_CACHE_TTL_SECONDS
         }
         
         logger.debug(f"Added avatar for user {user_id} to cache")
@@ -68,6 +170,26 @@ class AvatarService:
             
         return None
     
+    @classmethod
+    def _to_http_datetime(cls, value: datetime) -> datetime:
+        """Normalize a stored (naive UTC) timestamp to an aware UTC datetime with HTTP-date precision."""
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).replace(microsecond=0)
+    
+    @classmethod
+    def _is_not_modified_since(cls, if_modified_since: str, last_modified: datetime) -> bool:
+        """Check an If-Modified-Since header (any RFC 5322 / HTTP-date form) against last_modified."""
+        try:
+            if_modified_dt = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid If-Modified-Since header: {if_modified_since}")
+            return False
+        
+        if if_modified_dt.tzinfo is None:
+            if_modified_dt = if_modified_dt.replace(tzinfo=timezone.utc)
+        return last_modified <= if_modified_dt
+    
     @classmethod
     def _detect_image_format(cls, avatar_data: bytes) -> Tuple[str, str]:
         """Detect image format and return MIME type and file extension."""
@@ -92,12 +214,14 @@ class AvatarService:
         user_id: str, 
         if_none_match: Optional[str] = None,
         if_modified_since: Optional[str] = None
-    ) -> Tuple[Optional[bytes], Optional[str], Optional[datetime], Optional[str]]:
+    ) -> Tuple[Optional[Union[BinaryIO, bytes]], Optional[str], Optional[datetime], Optional[str]]:
         """
         Get user avatar with caching support.
         
         Returns:
-            Tuple of (avatar_data, etag, last_modified, content_type)
+            Tuple of (avatar, etag, last_modified, content_type), where avatar is an open handle on
+            the decoded file on disk, or the decoded bytes when caching is disabled or the file was
+            evicted before it could be opened
         """
         try:
             # Try cache first
@@ -111,18 +235,16 @@ class AvatarService:
                     logger.debug(f"ETag match for user {user_id}, returning 304")
                     return None, etag, last_modified, None
                 
-                if if_modified_since:
-                    try:
-                        if_modified_dt = datetime.strptime(if_modified_since, "%a, %d %b %Y %H:%M:%S GMT")
-                        if last_modified <= if_modified_dt:
-                            logger.debug(f"Not modified for user {user_id}, returning 304")
-                            return None, etag, last_modified, None
-                    except ValueError:
-                        logger.warning(f"Invalid If-Modified-Since header: {if_modified_since}")
+                if if_modified_since and cls._is_not_modified_since(if_modified_since, last_modified):
+                    logger.debug(f"Not modified for user {user_id}, returning 304")
+                    return None, etag, last_modified, None
                 
-                avatar_data = cached_avatar['data']
-                content_type, _ = cls._detect_image_format(avatar_data)
-                return avatar_data, etag, last_modified, content_type
+                avatar_file = cls._open_avatar_file(cached_avatar['path'])
+                if avatar_file is not None:
+                    return avatar_file, etag, last_modified, cached_avatar['content_type']
+                
+                # Evicted by another worker; rebuild it from the database below
+                cls._cache.pop(user_id, None)
             
             # Cache miss, fetch from database
             logger.debug(f"Cache miss for user {user_id}, fetching from database")
@@ -133,42 +255,56 @@ class AvatarService:
                 return None, None, None, None
             
             try:
-                # Decode base64 avatar
-                avatar_data = base64.b64decode(user.avatar_base64)
-                
-                # Validate file size
-                if len(avatar_data) > settings.AVATAR_MAX_FILE_SIZE_MB * 1024 * 1024:
-                    logger.warning(f"Avatar for user {user_id} exceeds size limit")
-                    raise HTTPException(
-                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                        detail="Avatar file size exceeds limit"
-                    )
-                
                 # Generate cache headers
                 etag = cls._generate_etag(user.avatar_base64)
-                last_modified = user.last_updated or user.registered_at or datetime.utcnow()
+                last_modified = cls._to_http_datetime(user.last_updated or user.registered_at or datetime.utcnow())
                 
-                # Check conditional requests before caching
+                # Check conditional requests before touching the avatar bytes
                 if if_none_match and if_none_match.strip('"') == etag:
                     return None, etag, last_modified, None
                 
-                if if_modified_since:
-                    try:
-                        if_modified_dt = datetime.strptime(if_modified_since, "%a, %d %b %Y %H:%M:%S GMT")
-                        if last_modified <= if_modified_dt:
-                            return None, etag, last_modified, None
-                    except ValueError:
-                        logger.warning(f"Invalid If-Modified-Since header: {if_modified_since}")
+                if if_modified_since and cls._is_not_modified_since(if_modified_since, last_modified):
+                    return None, etag, last_modified, None
+                
+                path = cls._get_cache_path(etag)
+                avatar_file = cls._open_avatar_file(path) if settings.AVATAR_CACHE_ENABLED else None
+                if avatar_file is not None:
+                    # Another worker already decoded this avatar
+                    header = avatar_file.read(12)
+                    avatar_file.seek(0)
+                    avatar = avatar_file
+                else:
+                    # Decode base64 avatar
+                    avatar_data = base64.b64decode(user.avatar_base64)
+                    
+                    # Validate file size
+                    if len(avatar_data) > settings.AVATAR_MAX_FILE_SIZE_MB * 1024 * 1024:
+                        logger.warning(f"Avatar for user {user_id} exceeds size limit")
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="Avatar file size exceeds limit"
+                        )
+                    
+                    if not settings.AVATAR_CACHE_ENABLED:
+                        content_type, _ = cls._detect_image_format(avatar_data[:12])
+                        return avatar_data, etag, last_modified, content_type
+                    
+                    path = cls._write_avatar_file(etag, avatar_data)
+                    header = avatar_data[:12]
+                    # Already in memory, so send it directly rather than reopening the file
+                    avatar = avatar_data
                 
                 # Detect content type
-                content_type, _ = cls._detect_image_format(avatar_data)
+                content_type, _ = cls._detect_image_format(header)
                 
                 # Add to cache
-                cls._add_to_cache(user_id, avatar_data, etag, last_modified)
+                cls._add_to_cache(user_id, path, etag, last_modified, content_type)
                 
                 logger.info(f"Successfully retrieved avatar for user {user_id}")
-                return avatar_data, etag, last_modified, content_type
+                return avatar, etag, last_modified, content_type
                 
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Error decoding avatar for user {user_id}: {str(e)}")
                 raise HTTPException(
@@ -187,15 +323,23 @@ class AvatarService:
     
     @classmethod
     def invalidate_cache(cls, user_id: str) -> None:
-        """Invalidate cache for a specific user."""
-        if user_id in cls._cache:
-            del cls._cache[user_id]
+        """Invalidate cache for a specific user and delete their decoded avatar file."""
+        cache_entry = cls._cache.pop(user_id, None)
+        if cache_entry:
+            cls._remove_avatar_file(cache_entry['path'])
             logger.debug(f"Invalidated cache for user {user_id}")
     
     @classmethod
     def clear_cache(cls) -> None:
-        """Clear all avatar cache."""
+        """Clear all avatar cache, including decoded files on disk."""
         cls._cache.clear()
+        
+        cache_dir = Path(settings.AVATAR_CACHE_DIR)
+        if cache_dir.is_dir():
+            for path in cache_dir.glob('*.bin'):
+                path.unlink(missing_ok=True)
+        cls._disk_file_count = 0
+        
         logger.info("Cleared all avatar cache")
     
     @classmethod
@@ -209,5 +353,7 @@ class AvatarService:
             'valid_entries': valid_entries,
             'expired_entries': total_entries - valid_entries,
             'cache_enabled': settings.AVATAR_CACHE_ENABLED,
-            'cache_ttl_seconds': settings.AVATAR_CACHE_TTL_SECONDS
+            'cache_ttl_seconds': settings.AVATAR_CACHE_TTL_SECONDS,
+            'cache_dir': settings.AVATAR_CACHE_DIR,
+            'cache_max_files': settings.AVATAR_CACHE_MAX_FILES
         } 
\ No newline at end of file
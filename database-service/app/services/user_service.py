@@ -1,62 +1,152 @@
-from typing import Optional, List, Dict, Any
-from mongoengine import DoesNotExist, ValidationError
+from typing import Optional, List, Dict, Any, Hashable, Iterable, Tuple
+from cachetools import TTLCache
+from mongoengine import DoesNotExist, NotUniqueError, ValidationError
+from mongoengine.queryset.visitor import Q
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 
 from app.models.user import RegisteredUser
-from app.schemas.user import UserCreate, UserUpdate, UserQuery
+from app.schemas.user import (
+    UserCreate, UserQuery, KEYSET_ORDER_BY, MAX_USER_TAGS, encode_user_cursor, decode_user_cursor
+)
 from app.core.base import BaseService
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 class UserService(BaseService):
     """Enhanced service class for user-related database operations."""
     
+    # Possible outcomes of get_or_create_user
+    UPSERT_OUTCOMES = ('created', 'exists', 'conflict', 'invalid', 'error')
+    
+    # Possible outcomes of update_user_tags
+    TAG_UPDATE_OUTCOMES = ('updated', 'not_found', 'too_many', 'error')
+    
+    # Minimum search term length for the real_name text index
+    TEXT_SEARCH_MIN_LENGTH = RegisteredUser.TEXT_SEARCH_MIN_LENGTH
+    
+    # Short-lived in-process cache of user response dicts for hot lookups
+    _cache: TTLCache = TTLCache(maxsize=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL_SECONDS)
+    _cache_lock = threading.RLock()
+    
     @classmethod
     def get_model_class(cls):
         """Return the RegisteredUser model class."""
         return RegisteredUser
     
+    @classmethod
+    def _get_cached_user(cls, key: Hashable, loader) -> Optional[Dict[str, Any]]:
+        """Get a user response dict from cache, loading and caching it on a miss."""
+        if not settings.CACHE_ENABLED:
+            user = loader()
+            return user.to_dict() if user else None
+        
+        with cls._cache_lock:
+            user_dict = cls._cache.get(key)
+        if user_dict is not None:
+            return user_dict
+        
+        user = loader()
+        if not user:
+            return None
+        
+        user_dict = user.to_dict()
+        with cls._cache_lock:
+            cls._cache[key] = user_dict
+        return user_dict
+    
+    @classmethod
+    def _invalidate_cached_users(cls, user_object_ids: Iterable[str]) -> None:
+        """Drop cached lookups for the given users after a write."""
+        if not settings.CACHE_ENABLED:
+            return
+        
+        user_object_ids = set(user_object_ids)
+        with cls._cache_lock:
+            stale_keys = [key for key, user_dict in cls._cache.items() if user_dict['id'] in user_object_ids]
+            for key in stale_keys:
+                cls._cache.pop(key, None)
+    
     @classmethod
     def create_user(cls, user_data: UserCreate) -> Optional[RegisteredUser]:
         """Create a new user with enhanced validation."""
         try:
-            # Check if user already exists by Discord ID
-            existing_user = RegisteredUser.get_by_discord_id(
-                user_data.user_id, 
-                user_data.guild_id
-            )
+            # Check Discord ID and email conflicts in a single round trip
+            existing_user = RegisteredUser.objects(
+                Q(user_id=user_data.user_id, guild_id=user_data.guild_id) | Q(email=user_data.email)
+            ).only('user_id', 'guild_id', 'email').first()
             
             if existing_user:
-                logger.warning(
-                    f"User already exists with Discord ID: user_id={user_data.user_id}, "
-                    f"guild_id={user_data.guild_id}"
-                )
-                return None
-            
-            # Check if email is already taken
-            existing_email = RegisteredUser.get_by_email(user_data.email)
-            if existing_email:
-                logger.warning(f"Email already exists: {user_data.email}")
+                if existing_user.user_id == user_data.user_id and existing_user.guild_id == user_data.guild_id:
+                    logger.warning(
+                        "User already exists with Discord ID: user_id=%s, guild_id=%s",
+                        user_data.user_id, user_data.guild_id
+                    )
+                else:
+                    logger.warning("Email already exists: %s", user_data.email)
                 return None
             
-            # Convert Pydantic model to dict
-            user_dict = user_data.model_dump(exclude_unset=True)
+            # Dump once, dropping unset and default values; the model defaults fill them back in
+            user_dict = user_data.model_dump(mode='python', exclude_unset=True, exclude_defaults=True)
             
-            # Create new user using base service
-            user = cls.create(user_dict)
-            if user:
-                logger.info(f"Created user: {user.email} (Discord: {user.user_id})")
+            # Insert the new user; the unique indexes catch a concurrent duplicate
+            user = RegisteredUser(**user_dict)
+            user.save(force_insert=True)
+            logger.info("Created user: %s (Discord: %s)", user.email, user.user_id)
             
             return user
             
+        except (NotUniqueError, DuplicateKeyError) as e:
+            logger.warning("User created concurrently with the same Discord ID or email: %s", e)
+            return None
         except ValidationError as e:
-            logger.error(f"Validation error creating user: {str(e)}")
+            logger.error("Validation error creating user: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Error creating user: {str(e)}")
+            logger.error("Error creating user: %s", e)
             return None
     
+    @classmethod
+    def get_or_create_user(cls, user_data: UserCreate) -> Tuple[Optional[RegisteredUser], str]:
+        """Return the user with this Discord ID, creating it first if needed, in one round trip.
+        
+        Returns (user, outcome) where outcome is one of UPSERT_OUTCOMES; user is None unless
+        the outcome is 'created' or 'exists'.
+        """
+        try:
+            user_dict = user_data.model_dump(mode='python', exclude_unset=True, exclude_defaults=True)
+            # Pre-assign the id so an insert can be told apart from an existing match
+            new_user = RegisteredUser(id=ObjectId(), **user_dict)
+            new_user.validate()
+            new_id = new_user.id
+            document = new_user.to_mongo().to_dict()
+            
+            result = RegisteredUser._get_collection().find_one_and_update(
+                {'user_id': user_data.user_id, 'guild_id': user_data.guild_id},
+                {'$setOnInsert': document},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            if result['_id'] != new_id:
+                return RegisteredUser._from_son(result), 'exists'
+            logger.info("Created user: %s (Discord: %s)", user_data.email, user_data.user_id)
+            return RegisteredUser._from_son(result), 'created'
+            
+        except DuplicateKeyError as e:
+            logger.warning("Email already exists for another user: %s", e)
+            return None, 'conflict'
+        except ValidationError as e:
+            logger.warning("Validation error upserting user: %s", e)
+            return None, 'invalid'
+        except Exception as e:
+            logger.error("Error upserting user: %s", e)
+            return None, 'error'
+    
     @classmethod
     def get_user_by_id(cls, user_object_id: str) -> Optional[RegisteredUser]:
         """Get user by MongoDB ObjectId."""
@@ -68,266 +158,517 @@ class UserService(BaseService):
         try:
             return RegisteredUser.get_by_email(email)
         except Exception as e:
-            logger.error(f"Error getting user by email {email}: {str(e)}")
+            logger.error("Error getting user by email %s: %s", email, e)
             return None
     
+    @classmethod
+    def get_user_dict_by_email(cls, email: str) -> Optional[Dict[str, Any]]:
+        """Get user response dict by email address (cached when CACHE_ENABLED)."""
+        return cls._get_cached_user(('email', email), lambda: cls.get_user_by_email(email))
+    
+    @classmethod
+    def get_user_dict_by_user_id(cls, user_id: int, guild_id: int) -> Optional[Dict[str, Any]]:
+        """Get user response dict by Discord user_id and guild_id (cached when CACHE_ENABLED)."""
+        return cls._get_cached_user(
+            ('discord', user_id, guild_id),
+            lambda: cls.get_user_by_user_id(user_id, guild_id)
+        )
+    
     @classmethod
     def get_user_by_user_id(cls, user_id: int, guild_id: int) -> Optional[RegisteredUser]:
         """Get user by Discord user_id and guild_id."""
         try:
             return RegisteredUser.get_by_discord_id(user_id, guild_id)
         except Exception as e:
-            logger.error(f"Error getting user by Discord ID {user_id}, guild {guild_id}: {str(e)}")
+            logger.error("Error getting user by Discord ID %s, guild %s: %s", user_id, guild_id, e)
             return None
     
     @classmethod
-    def update_user(cls, user_object_id: str, user_data: UserUpdate) -> Optional[RegisteredUser]:
-        """Update user information with enhanced validation."""
+    def update_user(cls, user_object_id: str, update_data: Dict[str, Any]) -> Optional[RegisteredUser]:
+        """Update user information atomically and return the updated user.
+        
+        update_data holds only the fields that were provided (a UserUpdate dumped with exclude_unset).
+        """
         try:
-            user = RegisteredUser.objects(id=user_object_id).first()
-            if not user:
-                logger.warning(f"User not found for update: {user_object_id}")
-                return None
-            
-            # Get only the fields that were provided (exclude unset)
-            update_data = user_data.model_dump(exclude_unset=True)
-            
-            # Check if email is being changed and if new email already exists
-            if 'email' in update_data and update_data['email'] != user.email:
-                existing_email = RegisteredUser.get_by_email(update_data['email'])
+            # Check if the new email already belongs to another user
+            if 'email' in update_data:
+                existing_email = RegisteredUser.get_by_email(update_data['email'], fields=('id',))
                 if existing_email and str(existing_email.id) != user_object_id:
-                    logger.warning(f"Cannot update to existing email: {update_data['email']}")
+                    logger.warning("Cannot update to existing email: %s", update_data['email'])
                     return None
             
             # Check if avatar is being updated
             avatar_updated = 'avatar_base64' in update_data
             
-            # Update fields
-            user.update_from_dict(update_data)
-            user.save()
+            # Apply all fields in one findAndModify and get the updated document back
+            update_fields = {f'set__{field}': value for field, value in update_data.items()}
+            update_fields['set__last_updated'] = datetime.utcnow()
+            user = RegisteredUser.objects(id=user_object_id).modify(new=True, **update_fields)
+            if not user:
+                logger.warning("User not found for update: %s", user_object_id)
+                return None
+            
+            cls._invalidate_cached_users([user_object_id])
             
             # Clear avatar cache if avatar was updated
             if avatar_updated:
                 try:
                     from app.services.avatar_service import AvatarService
                     AvatarService.invalidate_cache(user_object_id)
-                    logger.info(f"Avatar cache invalidated for user: {user_object_id}")
+                    logger.info("Avatar cache invalidated for user: %s", user_object_id)
                 except Exception as cache_error:
-                    logger.warning(f"Failed to invalidate avatar cache for user {user_object_id}: {str(cache_error)}")
+                    logger.warning("Failed to invalidate avatar cache for user %s: %s", user_object_id, cache_error)
             
-            logger.info(f"Updated user: {user.email}")
+            logger.info("Updated user: %s", user.email)
             return user
             
         except ValidationError as e:
-            logger.error(f"Validation error updating user {user_object_id}: {str(e)}")
+            logger.error("Validation error updating user %s: %s", user_object_id, e)
             return None
         except Exception as e:
-            logger.error(f"Error updating user {user_object_id}: {str(e)}")
+            logger.error("Error updating user %s: %s", user_object_id, e)
             return None
     
     @classmethod
     def delete_user(cls, user_object_id: str) -> bool:
         """Delete user by id."""
-        return cls.delete(user_object_id)
+        deleted = cls.delete(user_object_id)
+        if deleted:
+            cls._invalidate_cached_users([user_object_id])
+        return deleted
     
     @classmethod
     def deactivate_user(cls, user_object_id: str) -> bool:
         """Deactivate user instead of deleting."""
         try:
-            user = RegisteredUser.objects(id=user_object_id).first()
-            if not user:
+            updated = RegisteredUser.objects(id=user_object_id).update_one(
+                set__is_active=False,
+                set__last_updated=datetime.utcnow()
+            )
+            if not updated:
                 return False
             
-            user.deactivate()
-            logger.info(f"Deactivated user: {user.email}")
+            cls._invalidate_cached_users([user_object_id])
+            logger.info("Deactivated user: %s", user_object_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error deactivating user {user_object_id}: {str(e)}")
+            logger.error("Error deactivating user %s: %s", user_object_id, e)
             return False
     
     @classmethod
     def activate_user(cls, user_object_id: str) -> bool:
         """Activate deactivated user."""
         try:
-            user = RegisteredUser.objects(id=user_object_id).first()
-            if not user:
+            updated = RegisteredUser.objects(id=user_object_id).update_one(
+                set__is_active=True,
+                set__last_updated=datetime.utcnow()
+            )
+            if not updated:
                 return False
             
-            user.activate()
-            logger.info(f"Activated user: {user.email}")
+            cls._invalidate_cached_users([user_object_id])
+            logger.info("Activated user: %s", user_object_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error activating user {user_object_id}: {str(e)}")
+            logger.error("Error activating user %s: %s", user_object_id, e)
             return False
     
     @classmethod
     def update_user_login(cls, user_object_id: str) -> bool:
         """Update user's last login timestamp."""
         try:
-            user = RegisteredUser.objects(id=user_object_id).first()
-            if not user:
+            now = datetime.utcnow()
+            updated = RegisteredUser.objects(id=user_object_id).update_one(
+                set__last_login=now,
+                set__last_updated=now
+            )
+            if not updated:
                 return False
             
-            user.update_last_login()
-            logger.info(f"Updated login timestamp for user: {user.email}")
+            cls._invalidate_cached_users([user_object_id])
+            logger.debug("Updated login timestamp for user: %s", user_object_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error updating login for user {user_object_id}: {str(e)}")
+            logger.error("Error updating login for user %s: %s", user_object_id, e)
             return False
     
     @classmethod
-    def query_users(cls, query: UserQuery) -> List[RegisteredUser]:
-        """Query users with enhanced filters."""
+    def apply_user_actions(cls, user_object_id: str, ops: List[str]) -> bool:
+        """Apply login/deactivate/activate actions in order as one atomic update."""
         try:
-            queryset = RegisteredUser.objects
-            
-            # Apply filters
-            if query.email:
-                queryset = queryset.filter(email=query.email)
-            if query.user_id is not None:
-                queryset = queryset.filter(user_id=query.user_id)
-            if query.guild_id is not None:
-                queryset = queryset.filter(guild_id=query.guild_id)
-            if query.is_active is not None:
-                queryset = queryset.filter(is_active=query.is_active)
-            if query.is_verified is not None:
-                queryset = queryset.filter(is_verified=query.is_verified)
-            if query.tag:
-                queryset = queryset.filter(tags=query.tag)
-            if query.search_name:
-                queryset = queryset.filter(real_name__icontains=query.search_name)
-            if query.education_stage:
-                queryset = queryset.filter(education_stage=query.education_stage)
-            
-            # Apply date filters
-            if query.registered_after:
-                queryset = queryset.filter(registered_at__gte=query.registered_after)
-            if query.registered_before:
-                queryset = queryset.filter(registered_at__lte=query.registered_before)
-            
-            # Apply ordering
-            if query.order_by:
-                if query.order_by.startswith('-'):
-                    queryset = queryset.order_by(query.order_by)
+            now = datetime.utcnow()
+            changes: Dict[str, Any] = {'set__last_updated': now}
+            for op in ops:
+                if op == 'login':
+                    changes['set__last_login'] = now
                 else:
-                    queryset = queryset.order_by(f'-{query.order_by}')
+                    # Later activate/deactivate actions override earlier ones
+                    changes['set__is_active'] = op == 'activate'
             
-            # Apply pagination
-            queryset = queryset.skip(query.offset).limit(query.limit)
+            updated = RegisteredUser.objects(id=user_object_id).update_one(**changes)
+            if not updated:
+                return False
             
-            return list(queryset)
+            cls._invalidate_cached_users([user_object_id])
+            logger.info("Applied actions %s to user: %s", ops, user_object_id)
+            return True
             
         except Exception as e:
-            logger.error(f"Error querying users: {str(e)}")
+            logger.error("Error applying actions to user %s: %s", user_object_id, e)
+            return False
+    
+    @classmethod
+    def _build_users_queryset(cls, query: UserQuery):
+        """Build the filtered, ordered and paginated queryset for a UserQuery."""
+        # Build the filter document in one pass and hand it to a single __raw__ query
+        raw: Dict[str, Any] = {}
+        if query.email:
+            raw['email'] = query.email
+        if query.user_id is not None:
+            raw['user_id'] = query.user_id
+        if query.guild_id is not None:
+            raw['guild_id'] = query.guild_id
+        if query.is_active is not None:
+            raw['is_active'] = query.is_active
+        if query.is_verified is not None:
+            raw['is_verified'] = query.is_verified
+        if query.tag:
+            raw['tags'] = query.tag
+        name_prefix = None
+        if query.search_name:
+            if len(query.search_name) >= cls.TEXT_SEARCH_MIN_LENGTH:
+                raw['$text'] = {'$search': query.search_name}
+            else:
+                # Too short for a useful text search; case-insensitive prefix range on the collated name index
+                name_prefix = query.search_name
+                raw['real_name'] = {'$gte': name_prefix, '$lt': name_prefix + '\uffff'}
+        if query.education_stage:
+            raw['education_stage'] = query.education_stage
+        
+        # Apply date filters
+        registered_at: Dict[str, datetime] = {}
+        if query.registered_after:
+            registered_at['$gte'] = query.registered_after
+        if query.registered_before:
+            registered_at['$lte'] = query.registered_before
+        if registered_at:
+            raw['registered_at'] = registered_at
+        
+        # Keyset pagination: continue strictly after the cursor's (registered_at, _id)
+        if query.cursor:
+            cursor_registered_at, cursor_id = decode_user_cursor(query.cursor)
+            raw['$or'] = [
+                {'registered_at': {'$lt': cursor_registered_at}},
+                {'registered_at': cursor_registered_at, '_id': {'$lt': cursor_id}}
+            ]
+        
+        queryset = RegisteredUser.objects(__raw__=raw)
+        if name_prefix is not None:
+            # Must match real_name_ci_idx's collation for the range to use it, as in search_by_name
+            queryset = queryset.collation(RegisteredUser.NAME_COLLATION)
+        
+        # Apply ordering
+        if query.cursor or (query.order_by and query.order_by in KEYSET_ORDER_BY):
+            # _id breaks registration-time ties so cursors are stable
+            queryset = queryset.order_by('-registered_at', '-id')
+        elif query.order_by:
+            if query.order_by.startswith('-'):
+                queryset = queryset.order_by(query.order_by)
+            else:
+                queryset = queryset.order_by(f'-{query.order_by}')
+        
+        # Apply pagination; the cursor replaces the offset
+        if not query.cursor:
+            queryset = queryset.skip(query.offset)
+        queryset = queryset.limit(query.limit)
+        return queryset
+    
+    @classmethod
+    def get_next_cursor(cls, query: UserQuery, users: List[Dict[str, Any]]) -> Optional[str]:
+        """Cursor for the page after users, or None when it was the last page or ordering has no keyset."""
+        if not users or len(users) < query.limit:
+            return None
+        if not (query.cursor or (query.order_by and query.order_by in KEYSET_ORDER_BY)):
+            return None
+        last_user = users[-1]
+        return encode_user_cursor(last_user['registered_at'], last_user['_id'])
+    
+    @classmethod
+    def query_users(cls, query: UserQuery) -> List[Dict[str, Any]]:
+        """Query users with enhanced filters. Returns raw MongoDB documents."""
+        try:
+            return list(cls._build_users_queryset(query).as_pymongo())
+        except Exception as e:
+            logger.error("Error querying users: %s", e)
             return []
     
     @classmethod
-    def get_user_count(cls, active_only: bool = False) -> int:
-        """Get total user count with optional active filter."""
+    def bulk_update_users_by_filter(cls, query: UserQuery, update_data: Dict[str, Any]) -> int:
+        """Update the users matched by a UserQuery (honouring its ordering and limit) server-side."""
         try:
-            if active_only:
-                return RegisteredUser.objects(is_active=True).count()
-            return RegisteredUser.objects.count()
+            object_ids = [doc['_id'] for doc in cls._build_users_queryset(query).only('id').as_pymongo()]
+            if not object_ids:
+                return 0
+            
+            update_fields = {f'set__{field}': value for field, value in update_data.items()}
+            update_fields['set__last_updated'] = datetime.utcnow()
+            
+            updated_count = RegisteredUser.objects(id__in=object_ids).update(**update_fields)
+            cls._invalidate_cached_users(str(object_id) for object_id in object_ids)
+            
+            logger.info("Bulk updated %s users by filter", updated_count)
+            return updated_count
+            
         except Exception as e:
-            logger.error(f"Error getting user count: {str(e)}")
+            logger.error("Error in bulk update by filter: %s", e)
             return 0
     
     @classmethod
-    def search_users_by_name(cls, name: str, limit: int = 20) -> List[RegisteredUser]:
-        """Search users by name (case-insensitive)."""
+    def get_users_by_ids(cls, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Resolve many users with a single id__in query. Returns raw MongoDB documents in request order."""
         try:
-            return RegisteredUser.search_by_name(name, limit)
+            object_ids = [ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)]
+            if not object_ids:
+                return []
+            
+            documents = {doc['_id']: doc for doc in RegisteredUser.objects(id__in=object_ids).as_pymongo()}
+            return [documents[object_id] for object_id in dict.fromkeys(object_ids) if object_id in documents]
+            
         except Exception as e:
-            logger.error(f"Error searching users by name '{name}': {str(e)}")
+            logger.error("Error getting users by ids: %s", e)
             return []
     
     @classmethod
-    def get_users_by_tag(cls, tag: str, limit: int = 50) -> List[RegisteredUser]:
-        """Get users by specific tag."""
+    def get_user_count(cls, active_only: bool = False, use_estimate: bool = False,
+                       tag: Optional[str] = None) -> int:
+        """
+        Get total user count with optional active and tag filters.
+        
+        With use_estimate, the unfiltered total is read from collection metadata
+        (estimated_document_count) instead of counting documents.
+        """
+        try:
+            if active_only or tag:
+                filters = {'is_active': True} if active_only else {}
+                if tag:
+                    filters['tags'] = tag
+                return RegisteredUser.objects(**filters).count()
+            if use_estimate:
+                return RegisteredUser._get_collection().estimated_document_count()
+            return RegisteredUser.objects.count()
+        except Exception as e:
+            logger.error("Error getting user count: %s", e)
+            return 0
+    
+    @classmethod
+    def search_users_by_name(cls, name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Search users by name (case-insensitive). Returns raw MongoDB documents."""
         try:
-            return RegisteredUser.get_by_tag(tag, limit)
+            return RegisteredUser.search_by_name(name, limit, as_pymongo=True)
         except Exception as e:
-            logger.error(f"Error getting users by tag '{tag}': {str(e)}")
+            logger.error("Error searching users by name '%s': %s", name, e)
             return []
     
     @classmethod
     def add_user_tag(cls, user_object_id: str, tag: str) -> bool:
         """Add a tag to user."""
         try:
-            user = RegisteredUser.objects(id=user_object_id).first()
-            if not user:
+            updated = RegisteredUser.objects(id=user_object_id).update_one(
+                add_to_set__tags=tag,
+                set__last_updated=datetime.utcnow()
+            )
+            if not updated:
                 return False
             
-            user.add_tag(tag)
-            logger.info(f"Added tag '{tag}' to user: {user.email}")
+            cls._invalidate_cached_users([user_object_id])
+            logger.info("Added tag '%s' to user: %s", tag, user_object_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error adding tag to user {user_object_id}: {str(e)}")
+            logger.error("Error adding tag to user %s: %s", user_object_id, e)
             return False
     
+    @classmethod
+    def update_user_tags(cls, user_object_id: str, add: List[str], remove: List[str]) -> str:
+        """
+        Add and remove several tags in one atomic update; removals are applied before additions.
+        
+        Returns one of TAG_UPDATE_OUTCOMES. The update is refused ('too_many') if the user would
+        end up with more than MAX_USER_TAGS tags.
+        """
+        try:
+            if not ObjectId.is_valid(user_object_id):
+                return 'not_found'
+            
+            add = list(dict.fromkeys(add))
+            # Pipeline update: $addToSet and $pullAll cannot both target tags in one update
+            new_tags = {
+                '$let': {
+                    'vars': {
+                        'kept': {
+                            '$filter': {
+                                'input': {'$ifNull': ['$tags', []]},
+                                'cond': {'$not': [{'$in': ['$$this', remove]}]}
+                            }
+                        }
+                    },
+                    'in': {
+                        '$concatArrays': [
+                            '$$kept',
+                            {'$filter': {'input': add, 'cond': {'$not': [{'$in': ['$$this', '$$kept']}]}}}
+                        ]
+                    }
+                }
+            }
+            collection = RegisteredUser._get_collection()
+            object_id = ObjectId(user_object_id)
+            # The size check runs in the filter so the cap holds against concurrent tag updates
+            result = collection.update_one(
+                {'_id': object_id, '$expr': {'$lte': [{'$size': new_tags}, MAX_USER_TAGS]}},
+                [{'$set': {'tags': new_tags, 'last_updated': datetime.utcnow()}}]
+            )
+            if not result.matched_count:
+                if collection.count_documents({'_id': object_id}, limit=1):
+                    logger.warning("Tag update for user %s would exceed %s tags", user_object_id, MAX_USER_TAGS)
+                    return 'too_many'
+                return 'not_found'
+            
+            cls._invalidate_cached_users([user_object_id])
+            logger.info("Updated tags for user %s: added %s, removed %s", user_object_id, add, remove)
+            return 'updated'
+            
+        except Exception as e:
+            logger.error("Error updating tags for user %s: %s", user_object_id, e)
+            return 'error'
+    
     @classmethod
     def remove_user_tag(cls, user_object_id: str, tag: str) -> bool:
         """Remove a tag from user."""
         try:
-            user = RegisteredUser.objects(id=user_object_id).first()
-            if not user:
+            updated = RegisteredUser.objects(id=user_object_id).update_one(
+                pull__tags=tag,
+                set__last_updated=datetime.utcnow()
+            )
+            if not updated:
                 return False
             
-            user.remove_tag(tag)
-            logger.info(f"Removed tag '{tag}' from user: {user.email}")
+            cls._invalidate_cached_users([user_object_id])
+            logger.info("Removed tag '%s' from user: %s", tag, user_object_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error removing tag from user {user_object_id}: {str(e)}")
+            logger.error("Error removing tag from user %s: %s", user_object_id, e)
             return False
     
     @classmethod
     def get_user_statistics(cls) -> Dict[str, Any]:
         """Get user statistics for analytics."""
         try:
-            total_users = RegisteredUser.objects.count()
-            active_users = RegisteredUser.objects(is_active=True).count()
-            verified_users = RegisteredUser.objects(is_verified=True).count()
-            
             # Get registration stats for last 30 days
-            from datetime import timedelta
             thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            recent_registrations = RegisteredUser.objects(
-                registered_at__gte=thirty_days_ago
-            ).count()
+            
+            # Separate counts let the active and recent filters use their indexes; a $facet would scan every document
+            total_users = RegisteredUser._get_collection().estimated_document_count()
+            active_users = RegisteredUser.objects(is_active=True).count()
+            verified_users = RegisteredUser.objects(is_verified=True).count()
+            recent_registrations = RegisteredUser.objects(registered_at__gte=thirty_days_ago).count()
             
             return {
                 'total_users': total_users,
                 'active_users': active_users,
                 'verified_users': verified_users,
-                'inactive_users': total_users - active_users,
+                'inactive_users': max(total_users - active_users, 0),
                 'recent_registrations_30d': recent_registrations,
                 'verification_rate': (verified_users / total_users * 100) if total_users > 0 else 0
             }
             
         except Exception as e:
-            logger.error(f"Error getting user statistics: {str(e)}")
+            logger.error("Error getting user statistics: %s", e)
             return {}
     
     @classmethod
     def bulk_update_users(cls, user_ids: List[str], update_data: Dict[str, Any]) -> int:
-        """Bulk update multiple users."""
-        updated_count = 0
+        """Bulk update multiple users with a single updateMany."""
+        try:
+            object_ids = [ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)]
+            if not object_ids:
+                return 0
+            
+            update_fields = {f'set__{field}': value for field, value in update_data.items()}
+            update_fields['set__last_updated'] = datetime.utcnow()
+            
+            updated_count = RegisteredUser.objects(id__in=object_ids).update(**update_fields)
+            cls._invalidate_cached_users(str(object_id) for object_id in object_ids)
+            
+            logger.info("Bulk updated %s users", updated_count)
+            return updated_count
+            
+        except Exception as e:
+            logger.error("Error in bulk update: %s", e)
+            return 0
+    
+    @classmethod
+    def _to_mongo_set(cls, update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate update values against the model fields and convert them to a raw $set document.
+        
+        Raises ValidationError for invalid values and for nulls in required fields.
+        """
+        document = {}
+        for name, value in update_data.items():
+            field = RegisteredUser._fields[name]
+            if value is None:
+                if field.required:
+                    raise ValidationError(f"{name} is required and cannot be null")
+            else:
+                field.validate(value)
+                value = field.to_mongo(value)
+            document[field.db_field] = value
+        return document
+    
+    @classmethod
+    def bulk_update_users_individually(cls, updates: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Apply per-user updates in a single unordered bulk_write round trip; invalid updates are skipped."""
         try:
-            for user_id in user_ids:
-                user = RegisteredUser.objects(id=user_id).first()
-                if user:
-                    user.update_from_dict(update_data)
-                    user.save()
-                    updated_count += 1
-            
-            logger.info(f"Bulk updated {updated_count} users")
+            now = datetime.utcnow()
+            operations = []
+            updated_ids = []
+            avatar_ids = []
+            for user_id, update_data in updates:
+                if not ObjectId.is_valid(user_id):
+                    continue
+                try:
+                    set_document = cls._to_mongo_set(update_data)
+                except ValidationError as e:
+                    logger.warning("Skipping invalid bulk update for user %s: %s", user_id, e)
+                    continue
+                set_document['last_updated'] = now
+                operations.append(UpdateOne({'_id': ObjectId(user_id)}, {'$set': set_document}))
+                updated_ids.append(user_id)
+                if 'avatar_base64' in update_data:
+                    avatar_ids.append(user_id)
+            if not operations:
+                return 0
+            
+            try:
+                result = RegisteredUser._get_collection().bulk_write(operations, ordered=False)
+                updated_count = result.matched_count
+            except BulkWriteError as e:
+                # Unordered writes keep going past failures such as duplicate emails
+                logger.warning("Bulk individual update had %s write errors", len(e.details.get('writeErrors', [])))
+                updated_count = e.details.get('nMatched', 0)
+            
+            cls._invalidate_cached_users(updated_ids)
+            if avatar_ids:
+                from app.services.avatar_service import AvatarService
+                for user_id in avatar_ids:
+                    AvatarService.invalidate_cache(user_id)
+            
+            logger.info("Bulk updated %s users individually", updated_count)
             return updated_count
             
         except Exception as e:
-            logger.error(f"Error in bulk update: {str(e)}")
-            return updated_count 
\ No newline at end of file
+            logger.error("Error in individual bulk update: %s", e)
+            return 0
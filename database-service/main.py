@@ -1,16 +1,22 @@
 import uvicorn
 from fastapi import FastAPI, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse
+import asyncio
 import logging
 import sys
+import time
 from datetime import datetime
 
 from app.core.config import settings
-from app.core.database import connect_to_mongo, disconnect_from_mongo
+from app.core.database import connect_to_mongo, disconnect_from_mongo, warm_up_pool
 from app.routers.users import router as users_router
 from app.core.security import api_auth_dependency
+from app.models.user import RegisteredUser
+from app.services.user_service import UserService
 
 # Configure logging based on settings
 log_format = (
@@ -53,6 +59,7 @@ app = FastAPI(
     - Comprehensive audit logging
     """,
     version=settings.SERVICE_VERSION,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_tags=[
@@ -91,7 +98,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     
     if settings.is_production():
         # Don't expose internal errors in production
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "success": False,
@@ -102,7 +109,7 @@ async def global_exception_handler(request: Request, exc: Exception):
         )
     else:
         # Show detailed errors in development
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "success": False,
@@ -130,6 +137,8 @@ async def startup_event():
     # Connect to database
     try:
         connect_to_mongo()
+        await run_in_threadpool(warm_up_pool)
+        await run_in_threadpool(RegisteredUser.ensure_indexes)
         logger.info("Database connection established")
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
@@ -150,15 +159,32 @@ async def shutdown_event():
     
     logger.info(f"{settings.SERVICE_NAME} shut down successfully")
 
+# Last /health payload, reused for HEALTH_CACHE_TTL_SECONDS so frequent probes don't hit MongoDB
+_health_cache = {'expires_at': 0.0, 'payload': None}
+_health_lock = asyncio.Lock()
+
 # System endpoints
 @app.get("/health", tags=["System"], summary="Health Check", description="Check service health and status")
 async def health_check():
     """Health check endpoint with detailed service information."""
-    from app.services.user_service import UserService
+    if time.monotonic() < _health_cache['expires_at']:
+        return _health_cache['payload']
     
+    async with _health_lock:
+        # Another request may have refreshed the payload while we waited
+        if time.monotonic() < _health_cache['expires_at']:
+            return _health_cache['payload']
+        
+        payload = await _build_health_payload()
+        _health_cache['payload'] = payload
+        _health_cache['expires_at'] = time.monotonic() + settings.HEALTH_CACHE_TTL_SECONDS
+        return payload
+
+async def _build_health_payload():
+    """Check database connectivity and build the health payload."""
     try:
-        # Test database connectivity
-        user_count = UserService.get_user_count()
+        # Test database connectivity without blocking the event loop
+        user_count = await run_in_threadpool(UserService.get_user_count, use_estimate=True)
         db_status = "connected"
     except Exception as e:
         logger.error(f"Database health check failed: {str(e)}")
@@ -207,6 +233,7 @@ async def root():
                 "update": "PUT /users/{user_id}",
                 "delete": "DELETE /users/{user_id}",
                 "query": "POST /users/query",
+                "batch": "POST /users/batch",
                 "list": "GET /users/",
                 "search": "GET /users/search/name/{name}",
                 "tags": "GET /users/tag/{tag}",
@@ -225,16 +252,16 @@ async def root():
     }
 
 @app.get("/openapi.json", include_in_schema=False)
-async def get_openapi():
-    """Get OpenAPI specification."""
-    from fastapi.openapi.utils import get_openapi
-    
-    return get_openapi(
-        title=app.title,
-        version=app.version,
-        description=app.description,
-        routes=app.routes,
-    )
+async def get_openapi_spec():
+    """Get OpenAPI specification (built once and cached on the app)."""
+    if not app.openapi_schema:
+        app.openapi_schema = get_openapi(
+            title=app.title,
+            version=app.version,
+            description=app.description,
+            routes=app.routes,
+        )
+    return app.openapi_schema
 
 # Development helper endpoints (only in development mode)
 if settings.is_development():
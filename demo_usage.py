@@ -6,107 +6,120 @@ Demonstrates enhanced features and usage patterns.
 
 import asyncio
 import json
+import sys
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from database_client import DatabaseClient, DatabaseClientError
+from types import MappingProxyType
+from typing import Callable, Iterator
+from database_client import CachedDatabaseClient, DatabaseClient, DatabaseClientError
 import logging
 
+try:
+    import uvloop  # libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# Read-only payload for the demo user, built once at import time
+_DEMO_USER = MappingProxyType({
+    "user_id": 111222333,
+    "guild_id": 444555666,
+    "real_name": "Demo User",
+    "email": "demo@hackit.tw",
+    "bio": "I'm a demo user showcasing the HackIt Database Service!",
+    "location": "Taipei, Taiwan",
+    "website": "https://hackit.tw",
+    "github_username": "hackit-demo",
+    "linkedin_url": "https://linkedin.com/in/hackitdemo",
+    "tags": ("student", "developer", "hackathon")
+})
 
-async def demo_basic_crud():
-    """Demonstrate basic CRUD operations."""
-    print("\n📝 Basic CRUD Operations Demo")
-    print("-" * 40)
+
+@contextmanager
+def _phase(*header: str) -> Iterator[Callable[[str], None]]:
+    """Collect a demo phase's output lines and write them to stdout in one call on exit.
     
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
-        # Create a new user
-        user_data = {
-            "user_id": 111222333,
-            "guild_id": 444555666,
-            "real_name": "Demo User",
-            "email": "demo@hackit.tw",
-            "bio": "I'm a demo user showcasing the HackIt Database Service!",
-            "location": "Taipei, Taiwan",
-            "website": "https://hackit.tw",
-            "github_username": "hackit-demo",
-            "linkedin_url": "https://linkedin.com/in/hackitdemo",
-            "tags": ["student", "developer", "hackathon"]
-        }
-        
+    Also keeps the output of concurrently running phases from interleaving.
+    """
+    lines = list(header)
+    try:
+        yield lines.append
+    finally:
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+
+
+async def demo_basic_crud(client: DatabaseClient):
+    """Demonstrate basic CRUD operations."""
+    with _phase("\n📝 Basic CRUD Operations Demo", "-" * 40) as say:
         try:
-            print("Creating new user...")
-            result = await client.create_user(user_data)
+            say("Creating new user...")
+            result = await client.create_user(_DEMO_USER)
             if result["success"]:
                 user_id = result["data"]["id"]
-                print(f"✅ User created successfully! ID: {user_id}")
+                say(f"✅ User created successfully! ID: {user_id}")
                 
                 # Read the user
-                print("\nRetrieving user information...")
+                say("\nRetrieving user information...")
                 user = await client.get_user_by_id(user_id)
                 if user["success"]:
-                    print(f"✅ User found: {user['data']['real_name']}")
-                    print(f"   Profile completeness: {user['data']['profile_completeness']:.1f}%")
+                    say(f"✅ User found: {user['data']['real_name']}")
+                    say(f"   Profile completeness: {user['data']['profile_completeness']:.1f}%")
                 
                 # Update the user
-                print("\nUpdating user bio...")
+                say("\nUpdating user bio...")
                 update_result = await client.update_user(user_id, {
                     "bio": "Updated bio: Now I'm an expert user of HackIt Database Service!"
                 })
                 if update_result["success"]:
-                    print("✅ User updated successfully!")
+                    say("✅ User updated successfully!")
                 
                 return user_id
             else:
-                print(f"❌ Failed to create user: {result['message']}")
+                say(f"❌ Failed to create user: {result['message']}")
                 return None
                 
         except DatabaseClientError as e:
             if e.status_code == 409:
-                print("ℹ️  User already exists, retrieving existing user...")
-                user = await client.get_user_by_discord_id(111222333, 444555666)
+                say("ℹ️  User already exists, retrieving existing user...")
+                user = await client.get_user_by_discord_id(_DEMO_USER["user_id"], _DEMO_USER["guild_id"])
                 if user["success"]:
                     return user["data"]["id"]
             else:
-                print(f"❌ Error: {e}")
+                say(f"❌ Error: {e}")
                 return None
 
 
-async def demo_tag_management(user_id: str):
+async def demo_tag_management(client: DatabaseClient, user_id: str):
     """Demonstrate tag management features."""
-    print("\n🏷️  Tag Management Demo")
-    print("-" * 40)
-    
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+    with _phase("\n🏷️  Tag Management Demo", "-" * 40) as say:
         try:
             # Add tags
-            print("Adding tags to user...")
-            await client.add_user_tag(user_id, "api-demo")
-            await client.add_user_tag(user_id, "v1.1.0-tested")
-            print("✅ Tags added successfully!")
+            say("Adding tags to user...")
+            await client.add_user_tags(user_id, ["api-demo", "v1.1.0-tested"])
+            say("✅ Tags added successfully!")
             
             # Get users by tag
-            print("\nFinding users with 'developer' tag...")
-            result = await client.get_users_by_tag("developer")
+            say("\nFinding users with 'developer' tag...")
+            result = await client.get_users_by_tag("developer", limit=3)
             if result["success"]:
-                print(f"✅ Found {len(result['data'])} developers")
-                for user in result["data"][:3]:  # Show first 3
-                    print(f"   - {user['real_name']} ({user['email']})")
+                say(f"✅ Showing {len(result['data'])} newest developers")
+                for user in result["data"]:
+                    say(f"   - {user['real_name']} ({user['email']})")
             
         except Exception as e:
-            print(f"❌ Tag management error: {e}")
+            say(f"❌ Tag management error: {e}")
 
 
-async def demo_advanced_search():
+async def demo_advanced_search(client: DatabaseClient):
     """Demonstrate advanced search and query capabilities."""
-    print("\n🔍 Advanced Search Demo")
-    print("-" * 40)
-    
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+    with _phase("\n🔍 Advanced Search Demo", "-" * 40) as say:
         try:
             # Advanced query with multiple filters
-            print("Performing advanced user query...")
+            say("Performing advanced user query...")
             query_params = {
                 "is_active": True,
                 "limit": 5,
@@ -116,131 +129,125 @@ async def demo_advanced_search():
             
             result = await client.query_users(query_params)
             if result["success"]:
-                print(f"✅ Found {result['pagination']['total']} active users")
-                print("Recent users:")
+                say(f"✅ Found {result['pagination']['total']} active users")
+                say("Recent users:")
                 for user in result["data"]:
-                    print(f"   - {user['real_name']} (registered: {user['registered_at'][:10]})")
+                    say(f"   - {user['real_name']} (registered: {user['registered_at'][:10]})")
             
             # Search by name
-            print("\nSearching users by name...")
+            say("\nSearching users by name...")
             search_result = await client.search_users_by_name("Demo")
             if search_result["success"]:
-                print(f"✅ Found {len(search_result['data'])} users with 'Demo' in name")
+                say(f"✅ Found {len(search_result['data'])} users with 'Demo' in name")
             
-            # List users with pagination
-            print("\nListing users with pagination...")
-            list_result = await client.list_users(limit=3, offset=0, active_only=True)
-            if list_result["success"]:
-                print(f"✅ Retrieved {len(list_result['data'])} users")
-                print(f"   Total active users: {list_result['pagination']['total']}")
+            # Walk all active users with cursor pagination
+            say("\nListing users with cursor pagination...")
+            cursor = None
+            pages = 0
+            retrieved = 0
+            while True:
+                list_result = await client.list_users(limit=100, active_only=True, cursor=cursor)
+                if not list_result["success"]:
+                    break
+                pages += 1
+                retrieved += len(list_result["data"])
+                cursor = list_result["pagination"].get("next_cursor")
+                if not cursor:
+                    break
+            say(f"✅ Retrieved {retrieved} users in {pages} page(s)")
             
         except Exception as e:
-            print(f"❌ Search error: {e}")
+            say(f"❌ Search error: {e}")
 
 
-async def demo_analytics():
+async def demo_analytics(client: DatabaseClient):
     """Demonstrate analytics and statistics features."""
-    print("\n📊 Analytics Demo")
-    print("-" * 40)
-    
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+    with _phase("\n📊 Analytics Demo", "-" * 40) as say:
         try:
-            print("Retrieving user statistics...")
+            say("Retrieving user statistics...")
             result = await client.get_user_statistics()
             if result["success"]:
                 stats = result["data"]
-                print("✅ Database Statistics:")
-                print(f"   📈 Total Users: {stats['total_users']}")
-                print(f"   🟢 Active Users: {stats['active_users']}")
-                print(f"   ✅ Verified Users: {stats['verified_users']}")
-                print(f"   📅 New Registrations (30d): {stats['recent_registrations_30d']}")
-                print(f"   📊 Verification Rate: {stats['verification_rate']:.1f}%")
+                say("✅ Database Statistics:")
+                say(f"   📈 Total Users: {stats['total_users']}")
+                say(f"   🟢 Active Users: {stats['active_users']}")
+                say(f"   ✅ Verified Users: {stats['verified_users']}")
+                say(f"   📅 New Registrations (30d): {stats['recent_registrations_30d']}")
+                say(f"   📊 Verification Rate: {stats['verification_rate']:.1f}%")
             
         except Exception as e:
-            print(f"❌ Analytics error: {e}")
+            say(f"❌ Analytics error: {e}")
 
 
-async def demo_user_management(user_id: str):
+async def demo_user_management(client: DatabaseClient, user_id: str):
     """Demonstrate user status management."""
-    print("\n👥 User Management Demo")
-    print("-" * 40)
-    
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+    with _phase("\n👥 User Management Demo", "-" * 40) as say:
         try:
             # Update login timestamp
-            print("Updating user login timestamp...")
+            say("Updating user login timestamp...")
             result = await client.update_user_login(user_id)
             if result["success"]:
-                print("✅ Login timestamp updated!")
+                say("✅ Login timestamp updated!")
             
             # Deactivate and reactivate user (demonstration only)
-            print("\nTesting user deactivation/activation...")
+            say("\nTesting user deactivation/activation...")
             
             deactivate_result = await client.deactivate_user(user_id)
             if deactivate_result["success"]:
-                print("✅ User deactivated successfully")
+                say("✅ User deactivated successfully")
                 
                 # Check user status
                 user = await client.get_user_by_id(user_id)
                 if user["success"]:
-                    print(f"   User active status: {user['data']['is_active']}")
+                    say(f"   User active status: {user['data']['is_active']}")
                 
                 # Reactivate
                 activate_result = await client.activate_user(user_id)
                 if activate_result["success"]:
-                    print("✅ User reactivated successfully")
+                    say("✅ User reactivated successfully")
             
         except Exception as e:
-            print(f"❌ User management error: {e}")
+            say(f"❌ User management error: {e}")
 
 
-async def demo_bulk_operations():
+async def demo_bulk_operations(client: DatabaseClient):
     """Demonstrate bulk operations."""
-    print("\n🔄 Bulk Operations Demo")
-    print("-" * 40)
-    
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+    with _phase("\n🔄 Bulk Operations Demo", "-" * 40) as say:
         try:
-            # First, get some user IDs for bulk update
-            users = await client.list_users(limit=2)
-            if users["success"] and len(users["data"]) > 0:
-                user_ids = [user["id"] for user in users["data"]]
-                
-                print(f"Performing bulk update on {len(user_ids)} users...")
-                update_data = {
-                    "tags": ["bulk-updated", "demo"]
-                }
-                
-                result = await client.bulk_update_users(user_ids, update_data)
-                if result["success"]:
-                    print(f"✅ Bulk updated {result['data']['updated_count']} users")
+            # Let the server select and update the users in one request
+            say("Performing bulk update on up to 2 active users...")
+            update_data = {
+                "tags": ["bulk-updated", "demo"]
+            }
+            
+            result = await client.bulk_update_by_filter({"is_active": True, "limit": 2}, update_data)
+            if result["success"]:
+                if result["data"]["updated_count"] > 0:
+                    say(f"✅ Bulk updated {result['data']['updated_count']} users")
                 else:
-                    print(f"❌ Bulk update failed: {result['message']}")
+                    say("ℹ️  No users available for bulk operations demo")
             else:
-                print("ℹ️  No users available for bulk operations demo")
+                say(f"❌ Bulk update failed: {result['message']}")
                 
         except Exception as e:
-            print(f"❌ Bulk operations error: {e}")
+            say(f"❌ Bulk operations error: {e}")
 
 
-async def demo_error_handling():
+async def demo_error_handling(client: DatabaseClient):
     """Demonstrate error handling capabilities."""
-    print("\n⚠️  Error Handling Demo")
-    print("-" * 40)
-    
-    async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+    with _phase("\n⚠️  Error Handling Demo", "-" * 40) as say:
         try:
             # Try to get non-existent user
-            print("Testing error handling with non-existent user...")
+            say("Testing error handling with non-existent user...")
             result = await client.get_user_by_id("000000000000000000000000")
-            print(f"❌ Unexpected success: {result}")
+            say(f"❌ Unexpected success: {result}")
             
         except DatabaseClientError as e:
-            print(f"✅ Properly handled error: {e.status_code} - {e}")
+            say(f"✅ Properly handled error: {e.status_code} - {e}")
         
         try:
             # Try to create user with invalid data
-            print("Testing validation error handling...")
+            say("Testing validation error handling...")
             invalid_data = {
                 "user_id": -1,  # Invalid user ID
                 "guild_id": 123,
@@ -248,60 +255,68 @@ async def demo_error_handling():
                 "email": "invalid-email"  # Invalid email format
             }
             result = await client.create_user(invalid_data)
-            print(f"❌ Unexpected success: {result}")
+            say(f"❌ Unexpected success: {result}")
             
         except DatabaseClientError as e:
-            print(f"✅ Properly handled validation error: {e.status_code} - {e}")
+            say(f"✅ Properly handled validation error: {e.status_code} - {e}")
 
 
 async def main():
     """Main demonstration function."""
-    print("🚀 HackIt Database Service v1.1.0 - Feature Demo")
-    print("=" * 60)
-    print("This demo showcases the enhanced features and capabilities")
-    print("of the optimized HackIt Database Service.\n")
+    with _phase("🚀 HackIt Database Service v1.1.0 - Feature Demo", "=" * 60) as say:
+        say("This demo showcases the enhanced features and capabilities")
+        say("of the optimized HackIt Database Service.\n")
     
     try:
-        # Check service health first
-        async with DatabaseClient("http://localhost:8001", "your-secret-key") as client:
+        # One client (one connection pool, one lookup cache) is shared by every demo
+        async with CachedDatabaseClient("http://localhost:8001", "your-secret-key", cache_ttl=5.0) as client:
+            # Check service health first
             health = await client.health_check()
-            if health["status"] == "healthy":
-                print(f"✅ Service is healthy (v{health['version']})")
-            else:
-                print("❌ Service is not healthy!")
+            with _phase() as say:
+                if health["status"] == "healthy":
+                    say(f"✅ Service is healthy (v{health['version']})")
+                else:
+                    say("❌ Service is not healthy!")
+            if health["status"] != "healthy":
                 return
+            
+            # Run demonstrations
+            user_id = await demo_basic_crud(client)
+            
+            if user_id:
+                await demo_tag_management(client, user_id)
+                await demo_user_management(client, user_id)
+            
+            # The remaining demos don't depend on each other, so run them concurrently
+            results = await asyncio.gather(
+                demo_advanced_search(client),
+                demo_analytics(client),
+                demo_bulk_operations(client),
+                demo_error_handling(client),
+                return_exceptions=True
+            )
+            with _phase() as say:
+                for result in results:
+                    if isinstance(result, Exception):
+                        say(f"❌ Demo phase failed: {result}")
         
-        # Run demonstrations
-        user_id = await demo_basic_crud()
-        
-        if user_id:
-            await demo_tag_management(user_id)
-            await demo_user_management(user_id)
-        
-        await demo_advanced_search()
-        await demo_analytics()
-        await demo_bulk_operations()
-        await demo_error_handling()
-        
-        print("\n🎉 Demo completed successfully!")
-        print("\nKey improvements in v1.1.0:")
-        print("• 🔐 Enhanced security with HMAC authentication and rate limiting")
-        print("• 🏗️  Extensible architecture with base classes for easy model addition")
-        print("• 🔍 Advanced search and filtering capabilities")
-        print("• 🏷️  Tag management system for user categorization")
-        print("• 📊 Analytics and statistics for user insights")
-        print("• 🔄 Bulk operations for efficient data management")
-        print("• 👥 Comprehensive user status management")
-        print("• 📱 Public/private data separation")
-        print("• ⚡ 22 endpoints for complete user lifecycle management")
+        with _phase("\n🎉 Demo completed successfully!", "\nKey improvements in v1.1.0:") as say:
+            say("• 🔐 Enhanced security with HMAC authentication and rate limiting")
+            say("• 🏗️  Extensible architecture with base classes for easy model addition")
+            say("• 🔍 Advanced search and filtering capabilities")
+            say("• 🏷️  Tag management system for user categorization")
+            say("• 📊 Analytics and statistics for user insights")
+            say("• 🔄 Bulk operations for efficient data management")
+            say("• 👥 Comprehensive user status management")
+            say("• 📱 Public/private data separation")
+            say("• ⚡ 22 endpoints for complete user lifecycle management")
         
     except Exception as e:
-        print(f"\n💥 Demo failed: {str(e)}")
-        print("\nPlease ensure:")
-        print("1. Database service is running on http://localhost:8001")
-        print("2. MongoDB is accessible and running")
-        print("3. API secret key matches service configuration")
+        with _phase(f"\n💥 Demo failed: {str(e)}", "\nPlease ensure:") as say:
+            say("1. Database service is running on http://localhost:8001")
+            say("2. MongoDB is accessible and running")
+            say("3. API secret key matches service configuration")
 
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    (uvloop.run if uvloop else asyncio.run)(main())
@@ -4,25 +4,104 @@ Test script for HackIt Database Service API v1.1.0
 Tests all endpoints and validates functionality.
 """
 
+import argparse
 import asyncio
+import functools
+import httpx
 import json
+import statistics
 import sys
-from typing import Dict, Any
-from database_client import DatabaseClient, DatabaseClientError
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+from database_client import CachedDatabaseClient, DatabaseClient
 import logging
 
+try:
+    import uvloop  # libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# Read-only payload for the test user, built once at import time
+_TEST_USER = MappingProxyType({
+    "user_id": 123456789,
+    "guild_id": 987654321,
+    "real_name": "Test User",
+    "email": "test@example.com",
+    "bio": "This is a test user for API validation",
+    "location": "Taiwan",
+    "github_username": "testuser",
+    "tags": ("developer", "tester")
+})
+
+def _is_success(response: Dict[str, Any]) -> bool:
+    return bool(response and response.get("success"))
+
+def _found_users(response: Dict[str, Any]) -> str:
+    return f"Found {len(response['data'])} users"
+
+def record_test(name: str,
+                check: Callable[[Dict[str, Any]], bool] = _is_success,
+                describe: Optional[Callable[[Dict[str, Any]], str]] = None):
+    """
+    Turn an APITester coroutine that returns an API response into a recorded test.
+    
+    The wrapped method returns True if check(response) passed. The outcome, with
+    describe(response) and the elapsed time, is recorded through log_test; exceptions
+    raised by the call, check or describe count as failures.
+    """
+    def decorator(func: Callable[..., Awaitable[Dict[str, Any]]]):
+        @functools.wraps(func)
+        async def wrapper(self: "APITester", client: DatabaseClient, *args, **kwargs) -> bool:
+            started = time.perf_counter()
+            try:
+                response = await func(self, client, *args, **kwargs)
+                elapsed = f"{(time.perf_counter() - started) * 1000:.1f}ms"
+                if check(response):
+                    message = f"{describe(response)} ({elapsed})" if describe else elapsed
+                    self.log_test(name, True, message)
+                    return True
+                failure = (response or {}).get("message") or f"Unexpected response: {response}"
+            except Exception as e:
+                failure = f"{type(e).__name__}: {e}"
+            
+            self.log_test(name, False, failure)
+            return False
+        return wrapper
+    return decorator
+
+@dataclass(slots=True)
+class TestResult:
+    """Outcome of a single API test."""
+    __test__ = False  # Not a pytest test class
+    
+    name: str
+    status: str
+    message: str
+
 class APITester:
     """Comprehensive API testing class for HackIt Database Service."""
     
-    def __init__(self, base_url: str = "http://localhost:8001", api_secret: str = "your-secret-key"):
-        """Initialize API tester with client configuration."""
+    def __init__(self, base_url: str = "http://localhost:8001", api_secret: str = "your-secret-key",
+                 verbose: bool = False):
+        """Initialize API tester with client configuration. verbose logs each result as it is recorded."""
         self.base_url = base_url
         self.api_secret = api_secret
+        self.verbose = verbose
         self.test_user_id = None
+        
+        # One pooled transport reused by every test call
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=25, keepalive_expiry=60.0)
+        )
+        self._timeout = httpx.Timeout(30.0, connect=10.0)
+        # Per-request latencies (ms) reported by the client's timing hook
+        self.request_latencies: List[float] = []
         self.test_results = {
             "passed": 0,
             "failed": 0,
@@ -30,73 +109,64 @@ class APITester:
         }
     
     def log_test(self, test_name: str, success: bool, message: str = ""):
-        """Log test result."""
+        """Record test result (logged immediately only in verbose mode)."""
         status = "PASS" if success else "FAIL"
-        logger.info(f"[{status}] {test_name}: {message}")
+        if self.verbose:
+            logger.info("[%s] %s: %s", status, test_name, message)
         
-        self.test_results["tests"].append({
-            "name": test_name,
-            "status": status,
-            "message": message
-        })
+        self.test_results["tests"].append(TestResult(test_name, status, message))
         
         if success:
             self.test_results["passed"] += 1
         else:
             self.test_results["failed"] += 1
     
-    async def test_health_check(self, client: DatabaseClient) -> bool:
+    def _record_latency(self, method: str, path: str, elapsed_ms: float):
+        """Collect request latencies for the end-of-run percentile summary."""
+        self.request_latencies.append(elapsed_ms)
+    
+    def _flush_log(self):
+        """Emit all recorded results as a single log message."""
+        if self.verbose or not self.test_results["tests"]:
+            return
+        logger.info("\n".join(
+            f"[{test.status}] {test.name}: {test.message}" for test in self.test_results["tests"]
+        ))
+    
+    async def aclose(self):
+        """Close the pooled transport."""
+        await self._transport.aclose()
+    
+    @record_test("Health Check",
+                 check=lambda response: response.get("status") == "healthy",
+                 describe=lambda response: f"Service version: {response.get('version')}")
+    async def test_health_check(self, client: DatabaseClient) -> Dict[str, Any]:
         """Test health check endpoint."""
-        try:
-            response = await client.health_check()
-            if response.get("status") == "healthy":
-                self.log_test("Health Check", True, f"Service version: {response.get('version')}")
-                return True
-            else:
-                self.log_test("Health Check", False, f"Service unhealthy: {response}")
-                return False
-        except Exception as e:
-            self.log_test("Health Check", False, str(e))
-            return False
+        return await client.health_check()
     
-    async def test_create_user(self, client: DatabaseClient) -> bool:
-        """Test user creation."""
-        try:
-            user_data = {
-                "user_id": 123456789,
-                "guild_id": 987654321,
-                "real_name": "Test User",
-                "email": "test@example.com",
-                "bio": "This is a test user for API validation",
-                "location": "Taiwan",
-                "github_username": "testuser",
-                "tags": ["developer", "tester"]
-            }
-            
-            response = await client.create_user(user_data)
-            if response.get("success"):
-                self.test_user_id = response["data"]["id"]
-                self.log_test("Create User", True, f"Created user with ID: {self.test_user_id}")
-                return True
-            else:
-                self.log_test("Create User", False, response.get("message", "Unknown error"))
-                return False
-        except DatabaseClientError as e:
-            if e.status_code == 409:
-                # User already exists, try to find it
-                try:
-                    response = await client.get_user_by_discord_id(123456789, 987654321)
-                    if response.get("success"):
-                        self.test_user_id = response["data"]["id"]
-                        self.log_test("Create User", True, f"User already exists with ID: {self.test_user_id}")
-                        return True
-                except:
-                    pass
-            self.log_test("Create User", False, str(e))
-            return False
-        except Exception as e:
-            self.log_test("Create User", False, str(e))
-            return False
+    @record_test("Create User", describe=lambda response: f"User ID: {response['data']['id']}")
+    async def test_create_user(self, client: DatabaseClient) -> Dict[str, Any]:
+        """Test user creation, reusing the test user if it already exists."""
+        response = await client.create_user(_TEST_USER, upsert=True)
+        if response.get("success"):
+            self.test_user_id = response["data"]["id"]
+        return response
+    
+    @record_test("Get User by ID")
+    async def test_get_user_by_id(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.get_user_by_id(self.test_user_id)
+    
+    @record_test("Get User Public Info")
+    async def test_get_user_public_info(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.get_user_by_id(self.test_user_id, public_only=True)
+    
+    @record_test("Get User by Email")
+    async def test_get_user_by_email(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.get_user_by_email(_TEST_USER["email"])
+    
+    @record_test("Get User by Discord ID")
+    async def test_get_user_by_discord_id(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.get_user_by_discord_id(_TEST_USER["user_id"], _TEST_USER["guild_id"])
     
     async def test_get_user_operations(self, client: DatabaseClient) -> bool:
         """Test various user retrieval operations."""
@@ -104,78 +174,43 @@ class APITester:
             self.log_test("Get User Operations", False, "No test user ID available")
             return False
         
-        success_count = 0
-        total_tests = 4
-        
-        # Test get by ID
-        try:
-            response = await client.get_user_by_id(self.test_user_id)
-            if response.get("success"):
-                self.log_test("Get User by ID", True)
-                success_count += 1
-            else:
-                self.log_test("Get User by ID", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Get User by ID", False, str(e))
-        
-        # Test get public info
-        try:
-            response = await client.get_user_by_id(self.test_user_id, public_only=True)
-            if response.get("success"):
-                self.log_test("Get User Public Info", True)
-                success_count += 1
-            else:
-                self.log_test("Get User Public Info", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Get User Public Info", False, str(e))
-        
-        # Test get by email
-        try:
-            response = await client.get_user_by_email("test@example.com")
-            if response.get("success"):
-                self.log_test("Get User by Email", True)
-                success_count += 1
-            else:
-                self.log_test("Get User by Email", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Get User by Email", False, str(e))
-        
-        # Test get by Discord ID
-        try:
-            response = await client.get_user_by_discord_id(123456789, 987654321)
-            if response.get("success"):
-                self.log_test("Get User by Discord ID", True)
-                success_count += 1
-            else:
-                self.log_test("Get User by Discord ID", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Get User by Discord ID", False, str(e))
-        
-        return success_count == total_tests
+        # The four lookups are independent reads, so issue them concurrently
+        results = await asyncio.gather(
+            self.test_get_user_by_id(client),
+            self.test_get_user_public_info(client),
+            self.test_get_user_by_email(client),
+            self.test_get_user_by_discord_id(client)
+        )
+        return all(results)
     
-    async def test_update_user(self, client: DatabaseClient) -> bool:
+    @record_test("Update User")
+    async def test_update_user(self, client: DatabaseClient) -> Dict[str, Any]:
         """Test user update operations."""
         if not self.test_user_id:
-            self.log_test("Update User", False, "No test user ID available")
-            return False
+            raise ValueError("No test user ID available")
         
-        try:
-            update_data = {
-                "bio": "Updated bio for testing",
-                "website": "https://example.com",
-                "linkedin_url": "https://linkedin.com/in/testuser"
-            }
-            
-            response = await client.update_user(self.test_user_id, update_data)
-            if response.get("success"):
-                self.log_test("Update User", True)
-                return True
-            else:
-                self.log_test("Update User", False, response.get("message"))
-                return False
-        except Exception as e:
-            self.log_test("Update User", False, str(e))
-            return False
+        update_data = {
+            "bio": "Updated bio for testing",
+            "website": "https://example.com",
+            "linkedin_url": "https://linkedin.com/in/testuser"
+        }
+        return await client.update_user(self.test_user_id, update_data)
+    
+    @record_test("Add User Tag")
+    async def test_add_user_tag(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.add_user_tag(self.test_user_id, "api-single-tag")
+    
+    @record_test("Remove User Tag")
+    async def test_remove_user_tag(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.remove_user_tag(self.test_user_id, "api-single-tag")
+    
+    @record_test("Add User Tags")
+    async def test_add_user_tags(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.add_user_tags(self.test_user_id, ["api-tested", "tester"])
+    
+    @record_test("Get Users by Tag")
+    async def test_get_users_by_tag(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.get_users_by_tag("api-tested", limit=3)
     
     async def test_tag_operations(self, client: DatabaseClient) -> bool:
         """Test tag management operations."""
@@ -183,91 +218,82 @@ class APITester:
             self.log_test("Tag Operations", False, "No test user ID available")
             return False
         
-        success_count = 0
-        
-        # Test add tag
-        try:
-            response = await client.add_user_tag(self.test_user_id, "api-tested")
-            if response.get("success"):
-                self.log_test("Add User Tag", True)
-                success_count += 1
-            else:
-                self.log_test("Add User Tag", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Add User Tag", False, str(e))
-        
-        # Test get users by tag
-        try:
-            response = await client.get_users_by_tag("api-tested")
-            if response.get("success"):
-                self.log_test("Get Users by Tag", True)
-                success_count += 1
-            else:
-                self.log_test("Get Users by Tag", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Get Users by Tag", False, str(e))
-        
-        return success_count == 2
+        # The lookup depends on the tags just added, so these run in order
+        results = [
+            await self.test_add_user_tag(client),
+            await self.test_remove_user_tag(client),
+            await self.test_add_user_tags(client),
+            await self.test_get_users_by_tag(client)
+        ]
+        return all(results)
+    
+    @record_test("List Users", describe=_found_users)
+    async def test_list_users(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.list_users(limit=5)
+    
+    @record_test("Search Users by Name", describe=_found_users)
+    async def test_search_users_by_name(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.search_users_by_name("Test")
+    
+    @record_test("Advanced User Query", describe=_found_users)
+    async def test_query_users(self, client: DatabaseClient) -> Dict[str, Any]:
+        query_params = {
+            "is_active": True,
+            "limit": 10,
+            "order_by": "-registered_at"
+        }
+        return await client.query_users(query_params)
+    
+    @record_test("Paginate Users by Cursor",
+                 describe=lambda result: f"Walked {result['users']} users in {result['pages']} page(s)")
+    async def test_cursor_pagination(self, client: DatabaseClient) -> Dict[str, Any]:
+        """Walk every user with cursor pagination."""
+        cursor = None
+        pages = 0
+        total_users = 0
+        while True:
+            response = await client.list_users(limit=100, cursor=cursor)
+            if not response.get("success"):
+                return response
+            pages += 1
+            total_users += len(response["data"])
+            cursor = response["pagination"].get("next_cursor")
+            if not cursor:
+                return {"success": True, "pages": pages, "users": total_users}
     
     async def test_search_operations(self, client: DatabaseClient) -> bool:
         """Test search and query operations."""
-        success_count = 0
-        
-        # Test list users
-        try:
-            response = await client.list_users(limit=5)
-            if response.get("success"):
-                self.log_test("List Users", True, f"Found {len(response['data'])} users")
-                success_count += 1
-            else:
-                self.log_test("List Users", False, response.get("message"))
-        except Exception as e:
-            self.log_test("List Users", False, str(e))
-        
-        # Test search by name
-        try:
-            response = await client.search_users_by_name("Test")
-            if response.get("success"):
-                self.log_test("Search Users by Name", True, f"Found {len(response['data'])} users")
-                success_count += 1
-            else:
-                self.log_test("Search Users by Name", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Search Users by Name", False, str(e))
-        
-        # Test advanced query
-        try:
-            query_params = {
-                "is_active": True,
-                "limit": 10,
-                "order_by": "-registered_at"
-            }
-            response = await client.query_users(query_params)
-            if response.get("success"):
-                self.log_test("Advanced User Query", True, f"Found {len(response['data'])} users")
-                success_count += 1
-            else:
-                self.log_test("Advanced User Query", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Advanced User Query", False, str(e))
-        
-        return success_count == 3
+        # List, search and query don't depend on each other, so issue them concurrently
+        results = await asyncio.gather(
+            self.test_list_users(client),
+            self.test_search_users_by_name(client),
+            self.test_query_users(client)
+        )
+        paginated = await self.test_cursor_pagination(client)
+        return all(results) and paginated
     
-    async def test_analytics(self, client: DatabaseClient) -> bool:
+    @record_test("User Statistics",
+                 describe=lambda response: f"Total users: {response['data']['total_users']}, "
+                                           f"Active: {response['data']['active_users']}")
+    async def test_analytics(self, client: DatabaseClient) -> Dict[str, Any]:
         """Test analytics and statistics."""
-        try:
-            response = await client.get_user_statistics()
-            if response.get("success"):
-                stats = response["data"]
-                self.log_test("User Statistics", True, 
-                             f"Total users: {stats['total_users']}, Active: {stats['active_users']}")
-                return True
-            else:
-                self.log_test("User Statistics", False, response.get("message"))
-                return False
-        except Exception as e:
-            self.log_test("User Statistics", False, str(e))
-            return False
+        return await client.get_user_statistics()
+    
+    @record_test("Update User Login")
+    async def test_update_user_login(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.update_user_login(self.test_user_id)
+    
+    @record_test("Deactivate User")
+    async def test_deactivate_user(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.deactivate_user(self.test_user_id)
+    
+    @record_test("Activate User")
+    async def test_activate_user(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.activate_user(self.test_user_id)
+    
+    @record_test("User Actions (login, deactivate, activate)")
+    async def test_user_actions(self, client: DatabaseClient) -> Dict[str, Any]:
+        return await client.user_actions(self.test_user_id, ["login", "deactivate", "activate"])
     
     async def test_user_management(self, client: DatabaseClient) -> bool:
         """Test user status management operations."""
@@ -275,49 +301,24 @@ class APITester:
             self.log_test("User Management", False, "No test user ID available")
             return False
         
-        success_count = 0
-        
-        # Test update login
-        try:
-            response = await client.update_user_login(self.test_user_id)
-            if response.get("success"):
-                self.log_test("Update User Login", True)
-                success_count += 1
-            else:
-                self.log_test("Update User Login", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Update User Login", False, str(e))
-        
-        # Test deactivate user
-        try:
-            response = await client.deactivate_user(self.test_user_id)
-            if response.get("success"):
-                self.log_test("Deactivate User", True)
-                success_count += 1
-            else:
-                self.log_test("Deactivate User", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Deactivate User", False, str(e))
-        
-        # Test activate user
-        try:
-            response = await client.activate_user(self.test_user_id)
-            if response.get("success"):
-                self.log_test("Activate User", True)
-                success_count += 1
-            else:
-                self.log_test("Activate User", False, response.get("message"))
-        except Exception as e:
-            self.log_test("Activate User", False, str(e))
-        
-        return success_count == 3
+        # Deactivate must land before activate, so the single-action endpoints run in order
+        results = [
+            await self.test_update_user_login(client),
+            await self.test_deactivate_user(client),
+            await self.test_activate_user(client),
+            # The batched endpoint applies the same actions in order, in one request
+            await self.test_user_actions(client)
+        ]
+        return all(results)
     
     async def run_all_tests(self) -> Dict[str, Any]:
         """Run all API tests."""
         logger.info("🚀 Starting HackIt Database Service API Tests v1.1.0")
         logger.info("=" * 60)
         
-        async with DatabaseClient(self.base_url, self.api_secret) as client:
+        async with CachedDatabaseClient(self.base_url, self.api_secret, cache_ttl=5.0,
+                                        timeout=self._timeout, transport=self._transport,
+                                        on_request_timing=self._record_latency) as client:
             # Core functionality tests
             await self.test_health_check(client)
             await self.test_create_user(client)
@@ -330,18 +331,28 @@ class APITester:
             await self.test_analytics(client)
             await self.test_user_management(client)
         
+        self._flush_log()
+        
         # Print summary
         logger.info("=" * 60)
         logger.info(f"📊 Test Summary:")
         logger.info(f"   ✅ Passed: {self.test_results['passed']}")
         logger.info(f"   ❌ Failed: {self.test_results['failed']}")
         logger.info(f"   📈 Success Rate: {(self.test_results['passed'] / (self.test_results['passed'] + self.test_results['failed']) * 100):.1f}%")
+        if len(self.request_latencies) >= 2:
+            percentiles = statistics.quantiles(self.request_latencies, n=100)
+            logger.info(f"   ⏱️  Request latency ({len(self.request_latencies)} requests): "
+                        f"p50 {percentiles[49]:.1f}ms, p95 {percentiles[94]:.1f}ms, p99 {percentiles[98]:.1f}ms")
         
         return self.test_results
 
 
 async def main():
     """Main test function."""
+    parser = argparse.ArgumentParser(description="HackIt Database Service API tester")
+    parser.add_argument("--verbose", action="store_true", help="Log each test result as it completes")
+    args = parser.parse_args()
+    
     # Configuration
     base_url = "http://localhost:8001"
     api_secret = "your-secret-key"
@@ -352,8 +363,8 @@ async def main():
     print(f"Testing comprehensive API functionality...")
     print()
     
+    tester = APITester(base_url, api_secret, verbose=args.verbose)
     try:
-        tester = APITester(base_url, api_secret)
         results = await tester.run_all_tests()
         
         # Return appropriate exit code
@@ -372,8 +383,10 @@ async def main():
         print("2. MongoDB is accessible")
         print("3. API secret key is correctly configured")
         return 1
+    finally:
+        await tester.aclose()
 
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
+    exit_code = (uvloop.run if uvloop else asyncio.run)(main())
     sys.exit(exit_code) 
\ No newline at end of file